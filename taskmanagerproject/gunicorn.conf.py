@@ -0,0 +1,46 @@
+"""
+Gunicorn configuration for taskmanagerproject.
+
+The app is loaded once in the master and warmed up before any worker is
+forked, so workers start with URL resolvers, routes, serializers, filtersets
+and compiled templates already in (copy-on-write) memory.
+"""
+
+import os
+import time
+
+_config_loaded_at = time.perf_counter()
+
+wsgi_app = "taskmanagerproject.wsgi:application"
+bind = f"0.0.0.0:{os.getenv('PORT', '8000')}"
+# Without WEB_CONCURRENCY gunicorn keeps its default of one worker; size it
+# per deploy to the memory and database connections available.
+if "WEB_CONCURRENCY" in os.environ:
+    workers = int(os.environ["WEB_CONCURRENCY"])
+threads = int(os.getenv("GUNICORN_THREADS", "1"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+preload_app = os.getenv("GUNICORN_PRELOAD", "1") == "1"
+accesslog = "-"
+errorlog = "-"
+
+
+def on_starting(server):
+    if preload_app:
+        server.log.info("Application imported in %.1f ms", (time.perf_counter() - _config_loaded_at) * 1000)
+
+
+def when_ready(server):
+    if preload_app:
+        from taskmanagerproject.warmup import warm_up
+
+        timings = warm_up()
+        server.log.info(
+            "Warm-up done in %.1f ms (%s)",
+            sum(timings.values()),
+            ", ".join(f"{name}={ms:.1f}ms" for name, ms in timings.items()),
+        )
+    server.log.info("Master ready in %.1f ms", (time.perf_counter() - _config_loaded_at) * 1000)
+
+
+def post_worker_init(worker):
+    worker.log.info("Worker %s booted", worker.pid)
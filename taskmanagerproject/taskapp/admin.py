@@ -1,31 +1,173 @@
+from datetime import datetime
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as DjangoUserAdmin
-from .models import User, Task, Notification, TaskHistory
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils import timezone
+from django.utils.functional import cached_property
+from .models import User, Task, Notification, TaskHistory, ArchivedTaskHistory
+
+
+def estimate_table_rows(model, using):
+    """Planner row estimate for ``model``'s table, or None where the backend has none."""
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE oid = %s::regclass", [table])
+        elif connection.vendor == "mysql":
+            cursor.execute(
+                "SELECT TABLE_ROWS FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+                [table],
+            )
+        else:
+            return None
+        row = cursor.fetchone()
+    return int(row[0]) if row and row[0] is not None and row[0] >= 0 else None
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that skips the exact COUNT(*) on unfiltered changelists of big
+    tables and uses the database's row estimate instead. Filtered or small
+    result sets are still counted exactly.
+    """
+
+    threshold = 100_000
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if hasattr(queryset, "query") and self.is_unfiltered(queryset):
+            estimate = estimate_table_rows(queryset.model, queryset.db)
+            if estimate is not None and estimate >= self.threshold:
+                return estimate
+        return Paginator.count.func(self)
+
+    @staticmethod
+    def is_unfiltered(queryset):
+        # Filters the default manager always applies (e.g. the Task tombstone
+        # filter) do not count as changelist filters.
+        return queryset.query.where == queryset.model._default_manager.all().query.where
+
+
+class CreatedYearFilter(admin.SimpleListFilter):
+    """
+    Year drill-down for big tables. Replaces ``date_hierarchy``, whose year
+    links need a SELECT DISTINCT over the whole table: the years here come
+    from the first and last ``created_at``, two index-ordered lookups.
+    """
+
+    title = "created"
+    parameter_name = "created_year"
+
+    def lookups(self, request, model_admin):
+        dates = model_admin.get_queryset(request).order_by().values_list("created_at", flat=True)
+        first, last = dates.order_by("created_at").first(), dates.order_by("-created_at").first()
+        if first is None:
+            return []
+        first, last = timezone.localtime(first).year, timezone.localtime(last).year
+        return [(str(year), str(year)) for year in range(last, first - 1, -1)]
+
+    def queryset(self, request, queryset):
+        if not (self.value() or "").isdigit():
+            return queryset
+        year = int(self.value())
+        tz = timezone.get_current_timezone()
+        return queryset.filter(
+            created_at__gte=datetime(year, 1, 1, tzinfo=tz), created_at__lt=datetime(year + 1, 1, 1, tzinfo=tz),
+        )
+
+
+class LargeTableAdmin(admin.ModelAdmin):
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_per_page = 50
+
 
 @admin.register(User)
 class UserAdmin(DjangoUserAdmin):
     list_display = ("id", "username", "email", "date_joined", "is_staff")
     search_fields = ("username", "email")
     ordering = ("-date_joined",)
+    fieldsets = DjangoUserAdmin.fieldsets + (("Sharding", {"fields": ("shard",)}),)
 
 @admin.register(Task)
-class TaskAdmin(admin.ModelAdmin):
+class TaskAdmin(LargeTableAdmin):
     list_display = ("id", "user", "title", "priority", "status", "due_date", "created_at", "completed_at")
-    list_filter = ("priority", "status")
-    search_fields = ("title", "description")
+    list_filter = ("priority", "status", CreatedYearFilter)
+    list_select_related = ("user",)
+    search_fields = ("=title",)
+    search_help_text = "Task id, or exact title."
+    autocomplete_fields = ("user", "recurrence_parent")
     ordering = ("-created_at",)
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).defer("description")
+
+    def get_search_results(self, request, queryset, search_term):
+        # Also serves the task autocompletes of the other admins.
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        if term.isdigit():
+            return queryset.filter(pk=int(term)), False
+        return queryset.filter(title=term), False
+
+    def delete_model(self, request, obj):
+        obj.soft_delete()
+
+    def delete_queryset(self, request, queryset):
+        for task in queryset:
+            task.soft_delete()
+
 @admin.register(Notification)
-class NotificationAdmin(admin.ModelAdmin):
+class NotificationAdmin(LargeTableAdmin):
     list_display = ("id", "user", "task", "message", "is_read", "created_at")
-    list_filter = ("is_read",)
+    list_filter = ("is_read", CreatedYearFilter)
+    list_select_related = ("user", "task__user")
     search_fields = ("message",)
+    autocomplete_fields = ("user", "task")
     ordering = ("-created_at",)
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).defer("task__description")
+
 @admin.register(TaskHistory)
-class TaskHistoryAdmin(admin.ModelAdmin):
-    list_display = ("id", "user", "task", "action", "created_at")
-    list_filter = ("action",)
-    search_fields = ("task__title", "user__username")
+class TaskHistoryAdmin(LargeTableAdmin):
+    list_display = ("id", "user", "task", "action", "version", "created_at")
+    list_filter = ("action", CreatedYearFilter)
+    list_select_related = ("user", "task__user")
+    search_fields = ("=user__username",)
+    search_help_text = "Exact username, or a task id."
+    autocomplete_fields = ("user", "task")
+    ordering = ("-created_at",)
+
+    def get_queryset(self, request):
+        return super().get_queryset(request).defer("changes", "snapshot", "task__description")
+
+    def get_search_results(self, request, queryset, search_term):
+        # Exact, index-backed lookups instead of joined icontains scans.
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        if term.isdigit():
+            return queryset.filter(task_id=int(term)), False
+        return queryset.filter(user__username=term), False
+
+@admin.register(ArchivedTaskHistory)
+class ArchivedTaskHistoryAdmin(LargeTableAdmin):
+    list_display = ("id", "user_id", "task_id", "action", "version", "created_at", "archived_at")
+    list_filter = ("action", CreatedYearFilter)
+    search_fields = ("task_id",)
+    search_help_text = "Task id."
     ordering = ("-created_at",)
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).defer("changes", "snapshot")
+
+    def get_search_results(self, request, queryset, search_term):
+        term = search_term.strip()
+        if not term:
+            return queryset, False
+        return (queryset.filter(task_id=int(term)) if term.isdigit() else queryset.none()), False
@@ -0,0 +1,98 @@
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from .models import TaskListVersion
+
+# Filters whose result changes with the clock, not only with the user's tasks.
+TIME_RELATIVE_PARAMS = {"overdue", "due_within_hours", "as_of"}
+
+
+def get_user_version(user_id):
+    return TaskListVersion.objects.filter(user_id=user_id).values_list("version", flat=True).first() or 0
+
+
+def bump_user_version(user_id):
+    """Invalidate every cached task list of ``user_id`` in every worker."""
+    # A fresh, never-repeating value, written with a single upsert.
+    TaskListVersion.objects.bulk_create(
+        [TaskListVersion(user_id=user_id, version=time.time_ns())],
+        update_conflicts=True, unique_fields=["user_id"], update_fields=["version"],
+    )
+
+
+def _detached(data):
+    """Plain copy of serializer output, without ReturnList/ReturnDict back-references to the serializer."""
+    if isinstance(data, dict):
+        return {key: _detached(value) for key, value in data.items()}
+    if isinstance(data, list):
+        return [_detached(value) for value in data]
+    return data
+
+
+class LRUResultCache:
+    """Bounded, thread-safe LRU of response payloads with per-entry expiry; stores plain copies."""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, ttl):
+        if self.max_entries <= 0:
+            return
+        value = _detached(value)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = self.evictions = 0
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            }
+
+
+task_list_cache = LRUResultCache(getattr(settings, "TASK_LIST_CACHE_SIZE", 512))
+
+
+def task_list_cache_key(request):
+    """``(key, ttl)`` for a task list request: user, data version and normalized query string."""
+    params = tuple(sorted(
+        (name, tuple(sorted(v.strip() for v in values if v.strip())))
+        for name, values in request.query_params.lists()
+        if any(v.strip() for v in values)
+    ))
+    if TIME_RELATIVE_PARAMS.intersection(name for name, _ in params):
+        ttl = settings.TASK_LIST_CACHE_SHORT_TTL
+    else:
+        ttl = settings.TASK_LIST_CACHE_TTL
+    key = (request.user.pk, get_user_version(request.user.pk), request.get_host(), params)
+    return key, ttl
@@ -1,15 +1,17 @@
 import django_filters
+from rest_framework.filters import OrderingFilter
 from django.utils import timezone
 from datetime import timedelta
-from django.db.models import Exists, OuterRef
-from .models import Task, Notification, TaskHistory
+from django.db.models import Count, Exists, OuterRef
+from .models import Task, Notification, TaskHistory, TaggedTask, PRIORITY_CODES, STATUS_CODES, STATUS_TODO
+from . import recurrence
 
 
 class TaskFilter(django_filters.FilterSet):
     title = django_filters.CharFilter(field_name="title", lookup_expr="icontains")
     description = django_filters.CharFilter(field_name="description", lookup_expr="icontains")
-    status = django_filters.CharFilter(field_name="status", lookup_expr="iexact")
-    priority = django_filters.CharFilter(field_name="priority", lookup_expr="iexact")
+    status = django_filters.CharFilter(method="filter_code")
+    priority = django_filters.CharFilter(method="filter_code")
 
     created_between = django_filters.DateTimeFromToRangeFilter(field_name="created_at")
     due_between = django_filters.DateTimeFromToRangeFilter(field_name="due_date")
@@ -21,6 +23,14 @@ class TaskFilter(django_filters.FilterSet):
     overdue = django_filters.BooleanFilter(method="filter_overdue", help_text="True = due_date < now and not completed")
     due_within_hours = django_filters.NumberFilter(method="filter_due_within_hours", help_text="Return tasks due within N hours")
     has_notifications = django_filters.BooleanFilter(method="filter_has_notifications")
+    is_recurring = django_filters.BooleanFilter(method="filter_is_recurring")
+    tags = django_filters.CharFilter(method="filter_tags_any", help_text="Comma-separated; tasks with any of these tags")
+    tags_all = django_filters.CharFilter(method="filter_tags_all", help_text="Comma-separated; tasks with all of these tags")
+
+    CODES = {"status": STATUS_CODES, "priority": PRIORITY_CODES}
+
+    # Filters that are applied to recurrence rules before their occurrences are expanded.
+    OCCURRENCE_RULE_FILTERS = ["title", "description", "priority", "tags", "tags_all"]
 
     class Meta:
         model = Task
@@ -36,8 +46,17 @@ class TaskFilter(django_filters.FilterSet):
             "overdue",
             "due_within_hours",
             "has_notifications",
+            "is_recurring",
+            "tags",
+            "tags_all",
         ]
 
+    def filter_code(self, queryset, name, value):
+        code = self.CODES[name].get(value.strip().lower())
+        if code is None:
+            return queryset.none()
+        return queryset.filter(**{name: code})
+
     def filter_is_completed(self, queryset, name, value):
         if value:
             return queryset.exclude(completed_at__isnull=True)
@@ -70,6 +89,112 @@ class TaskFilter(django_filters.FilterSet):
             return qs.filter(_has_notifs=False)
         return queryset
 
+    def filter_is_recurring(self, queryset, name, value):
+        if value is True:
+            return queryset.exclude(recurrence="")
+        if value is False:
+            return queryset.filter(recurrence="")
+        return queryset
+
+    def _tagged(self, value):
+        names = sorted({name.strip() for name in value.split(",") if name.strip()})
+        tagged = TaggedTask.objects.filter(tag__name__in=names)
+        user = getattr(self.request, "user", None)
+        if user is not None and user.is_authenticated:
+            tagged = tagged.filter(user=user)
+        return tagged, names
+
+    def filter_tags_any(self, queryset, name, value):
+        tagged, names = self._tagged(value)
+        if not names:
+            return queryset
+        return queryset.filter(pk__in=tagged.values("content_object_id"))
+
+    def filter_tags_all(self, queryset, name, value):
+        tagged, names = self._tagged(value)
+        if not names:
+            return queryset
+        matching = (
+            tagged.values("content_object_id")
+            .annotate(matched=Count("tag_id", distinct=True))
+            .filter(matched=len(names))
+            .values("content_object_id")
+        )
+        return queryset.filter(pk__in=matching)
+
+    def due_window(self):
+        """``(start, end)`` of a fully bounded due_between filter, else None."""
+        if not self.is_valid():
+            return None
+        window = self.form.cleaned_data.get("due_between")
+        if not window or window.start is None or window.stop is None:
+            return None
+        return window.start, window.stop
+
+    def filter_rules(self, rules):
+        for name in self.OCCURRENCE_RULE_FILTERS:
+            value = self.form.cleaned_data.get(name)
+            if value not in (None, ""):
+                rules = self.filters[name].filter(rules, value)
+        return rules
+
+    def expand_occurrences(self, rules, window=None):
+        """Pending occurrences of ``rules`` in ``window`` (default: due_between) that match the other filters."""
+        window = self.occurrence_window(window)
+        if window is None:
+            return []
+        occurrences = recurrence.expand(self.filter_rules(rules), *window)
+        due_matches = self.due_matcher()
+        return [o for o in occurrences if due_matches(o.due_date)]
+
+    def pending_occurrence_dates(self, rules, window=None):
+        """Like expand_occurrences, but uncapped ``(rule, due date)`` pairs instead of Task objects."""
+        window = self.occurrence_window(window)
+        if window is None:
+            return []
+        due_matches = self.due_matcher()
+        return ((rule, when) for rule, when in recurrence.pending_dates(self.filter_rules(rules), *window) if due_matches(when))
+
+    def occurrence_window(self, window):
+        """``window`` (default: due_between), or None when no pending occurrence can match the filters."""
+        if window is None:
+            window = self.due_window()
+        if window is None or not self.is_valid():
+            return None
+        data = self.form.cleaned_data
+        if data.get("status") and STATUS_CODES.get(data["status"].strip().lower()) != STATUS_TODO:
+            return None
+        if data.get("is_completed") or data.get("completed_between") or data.get("has_notifications"):
+            return None
+        if data.get("is_recurring") is False:
+            return None
+        return window
+
+    def due_matcher(self):
+        """Predicate applying the overdue and due_within_hours filters to an occurrence due date."""
+        data = self.form.cleaned_data
+        now = timezone.now()
+        overdue = data.get("overdue")
+        horizon = None
+        if data.get("due_within_hours") is not None:
+            horizon = now + timedelta(hours=int(data["due_within_hours"]))
+
+        def matches(when):
+            if overdue is not None and (when < now) != overdue:
+                return False
+            return horizon is None or now <= when <= horizon
+        return matches
+
+
+class TaskOrderingFilter(OrderingFilter):
+    """Without an ``ordering`` param, lists limited by due_between come soonest-due first."""
+
+    def get_default_ordering(self, view):
+        filterset = view.filterset_class(view.request.query_params, queryset=Task.objects.none(), request=view.request)
+        if filterset.due_window() is not None:
+            return ["due_date"]
+        return super().get_default_ordering(view)
+
 
 class NotificationFilter(django_filters.FilterSet):
     is_read = django_filters.BooleanFilter(field_name="is_read")
@@ -1,6 +1,6 @@
 from django import forms
 from django.contrib.auth import authenticate, get_user_model
-from .models import Task, PRIORITY_CHOICES
+from .models import Task, PRIORITY_CHOICES, PRIORITY_NAMES
 
 User = get_user_model()
 
@@ -46,8 +46,19 @@ class SignupForm(forms.ModelForm):
         return user
 
 
+class CodeNameChoiceField(forms.TypedChoiceField):
+    """Select for an integer-coded model field whose options carry the code names."""
+    def __init__(self, names, choices, **kwargs):
+        self.names = names
+        codes = {name: code for code, name in names.items()}
+        super().__init__(choices=[(names[code], label) for code, label in choices], coerce=codes.get, **kwargs)
+
+    def prepare_value(self, value):
+        return self.names.get(value, value)
+
+
 class TaskForm(forms.ModelForm):
-    priority = forms.ChoiceField(choices=PRIORITY_CHOICES)
+    priority = CodeNameChoiceField(PRIORITY_NAMES, PRIORITY_CHOICES)
     due_date = forms.DateTimeField(
         required=False,
         widget=forms.DateTimeInput(attrs={"type": "datetime-local", "class": "form-control",
@@ -56,13 +67,27 @@ class TaskForm(forms.ModelForm):
         ),
         input_formats=["%Y-%m-%dT%H:%M", "%Y-%m-%d %H:%M", "%Y-%m-%d"],
     )
+    recurrence_end = forms.DateTimeField(
+        required=False,
+        widget=forms.DateTimeInput(attrs={"type": "datetime-local", "class": "form-control"}, format="%Y-%m-%dT%H:%M"),
+        input_formats=["%Y-%m-%dT%H:%M", "%Y-%m-%d %H:%M", "%Y-%m-%d"],
+    )
 
 
     class Meta:
         model = Task
-        fields = ["title", "priority", "description", "due_date"]
+        fields = ["title", "priority", "description", "due_date", "recurrence", "recurrence_end", "tags"]
         widgets = {
             "title": forms.TextInput(attrs={"placeholder": "Task title"}),
             "description": forms.Textarea(attrs={"rows": 4, "placeholder": "Optional details", "class": "form-control"}),
         }
 
+    def clean(self):
+        cleaned = super().clean()
+        if cleaned.get("recurrence") and not cleaned.get("due_date"):
+            self.add_error("due_date", "A recurring task needs a due date.")
+        recurrence_end, due_date = cleaned.get("recurrence_end"), cleaned.get("due_date")
+        if recurrence_end and due_date and recurrence_end < due_date:
+            self.add_error("recurrence_end", "Must not be before the due date.")
+        return cleaned
+
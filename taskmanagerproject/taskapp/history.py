@@ -0,0 +1,88 @@
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import OuterRef, Subquery
+from django.utils.dateparse import parse_datetime
+from .models import Task, TaskHistory, PRIORITY_CODES, STATUS_CODES
+
+DATETIME_FIELDS = {"due_date", "completed_at"}
+VERSION_RETRIES = 5
+# History stores these by name, the task row by code.
+CODED_FIELDS = {"priority": PRIORITY_CODES, "status": STATUS_CODES}
+
+
+def next_version(task: Task):
+    last = TaskHistory.objects.using(task._state.db).filter(task=task).order_by("-version").values_list("version", flat=True).first()
+    return (last or 0) + 1
+
+
+def wants_snapshot(version: int):
+    return version == 1 or version % settings.TASK_HISTORY_SNAPSHOT_EVERY == 0
+
+
+def record(task: Task, action, changes, state, using):
+    """
+    Append the next history entry of ``task``. (task, version) is unique, so
+    a concurrent writer that took the same version makes us re-read and retry.
+    """
+    for attempt in range(VERSION_RETRIES):
+        version = next_version(task)
+        snapshot = state if action != "updated" or wants_snapshot(version) else None
+        try:
+            with transaction.atomic(using=using):
+                return TaskHistory.objects.using(using).create(
+                    user_id=task.user_id, task=task, action=action, changes=changes, version=version, snapshot=snapshot,
+                )
+        except IntegrityError:
+            if attempt == VERSION_RETRIES - 1:
+                raise
+
+
+def _apply_state(task: Task, state: dict):
+    for field, value in state.items():
+        if field in DATETIME_FIELDS and isinstance(value, str):
+            value = parse_datetime(value)
+        elif field in CODED_FIELDS:
+            value = CODED_FIELDS[field].get(value, value)
+        setattr(task, field, value)
+    return task
+
+
+def tasks_as_of(tasks, as_of):
+    """
+    Rebuild ``tasks`` as they were at ``as_of``: start from the latest snapshot
+    taken before it and replay at most TASK_HISTORY_SNAPSHOT_EVERY diffs.
+    Tasks with no history yet at ``as_of`` are dropped.
+    """
+    tasks = list(tasks)
+    ids = [t.pk for t in tasks]
+    if not ids:
+        return []
+    history = TaskHistory.objects.using(tasks[0]._state.db)
+
+    latest_snapshot = (
+        TaskHistory.objects.filter(task_id=OuterRef("task_id"), created_at__lte=as_of, snapshot__isnull=False)
+        .order_by("-version")
+        .values("version")[:1]
+    )
+    snapshots = dict(
+        history.filter(task_id__in=ids, snapshot__isnull=False, version=Subquery(latest_snapshot))
+        .values_list("task_id", "snapshot")
+    )
+    diffs = (
+        history.filter(
+            task_id__in=ids, action="updated", created_at__lte=as_of, version__gt=Subquery(latest_snapshot)
+        )
+        .order_by("task_id", "version")
+        .values_list("task_id", "changes")
+    )
+    states = {task_id: dict(snapshot) for task_id, snapshot in snapshots.items()}
+    for task_id, changes in diffs:
+        if task_id in states:
+            states[task_id].update({field: new for field, (old, new) in changes.items()})
+
+    return [_apply_state(task, states[task.pk]) for task in tasks if task.pk in states]
+
+
+def task_as_of(task: Task, as_of):
+    rebuilt = tasks_as_of([task], as_of)
+    return rebuilt[0] if rebuilt else None
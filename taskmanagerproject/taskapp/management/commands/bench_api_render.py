@@ -0,0 +1,90 @@
+import gzip
+import random
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from taggit.models import Tag
+from taskapp.middleware import brotli
+from taskapp.models import User, Task, TaskHistory, PRIORITY_CHOICES, STATUS_CHOICES
+from taskapp.renderers import FastJSONRenderer, orjson
+from taskapp.serializers import TaskSerializer, TaskHistorySerializer
+
+WORDS = (
+    "review draft budget client meeting deploy release invoice report sprint backlog migrate "
+    "schema follow up with team before the after call email update docs fix bug in for on and"
+).split()
+
+
+class Command(BaseCommand):
+    help = "Benchmark serialize/render time and bytes on the wire for history-heavy API pages (no database needed)."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=100, help="Rows per page (default 100).")
+        parser.add_argument("--repeat", type=int, default=50, help="Timing iterations (default 50).")
+
+    def _time(self, fn, repeat):
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            best = min(best, time.perf_counter() - start)
+        return best * 1000
+
+    def _prefetched_tags(self, names):
+        # Stands in for prefetch_related("tags") so rendering never touches the database.
+        tags = Tag.objects.all()
+        tags._result_cache = [Tag(id=i + 1, name=name, slug=name) for i, name in enumerate(names)]
+        tags._prefetch_done = True
+        return tags
+
+    def _text(self, rng, low, high):
+        return " ".join(rng.choice(WORDS) for _ in range(rng.randint(low, high))) + f" #{rng.randrange(10**6)}"
+
+    def _payloads(self, rows):
+        # Seeded random text of varying length, so repeated rows do not
+        # overstate what compression saves on real data.
+        rng = random.Random(0)
+        now = timezone.now()
+        user = User(id=1, username="bench", email="bench@example.com")
+        tasks, histories = [], []
+        for i in range(rows):
+            task = Task(
+                id=i + 1, user=user, title=self._text(rng, 2, 6).capitalize(), description=self._text(rng, 0, 60),
+                priority=rng.choice(PRIORITY_CHOICES)[0], status=rng.choice(STATUS_CHOICES)[0],
+                due_date=now + timedelta(days=i, minutes=rng.randrange(1440)), created_at=now - timedelta(seconds=rng.randrange(10**7)),
+            )
+            task._prefetched_objects_cache = {"tags": self._prefetched_tags(["work", f"project-{i % 7}"])}
+            tasks.append(task)
+            state = {
+                "title": task.title, "description": task.description, "priority": task.priority_name,
+                "status": task.status_name, "due_date": task.due_date.isoformat(), "completed_at": None,
+            }
+            histories.append(TaskHistory(
+                id=i + 1, user=user, task=task, action="updated", version=i + 1, created_at=now,
+                changes={"status": ["todo", task.status_name], "description": [self._text(rng, 0, 30), task.description]}, snapshot=state,
+            ))
+        return {
+            "tasks": (TaskSerializer, tasks),
+            "task-history": (TaskHistorySerializer, histories),
+        }
+
+    def handle(self, *args, **options):
+        rows, repeat = options["rows"], options["repeat"]
+        self.stdout.write(f"orjson: {'yes' if orjson else 'no (stdlib fallback)'}, brotli: {'yes' if brotli else 'no'}")
+        for name, (serializer_class, objects) in self._payloads(rows).items():
+            data = {"count": rows, "next": None, "previous": None, "results": serializer_class(objects, many=True).data}
+            serialize_ms = self._time(lambda: serializer_class(objects, many=True).data, repeat)
+            stdlib_ms = self._time(lambda: JSONRenderer().render(data), repeat)
+            fast_ms = self._time(lambda: FastJSONRenderer().render(data), repeat)
+            body = FastJSONRenderer().render(data)
+            sizes = f"raw={len(body)}B gzip={len(gzip.compress(body, 6))}B"
+            if brotli is not None:
+                quality = getattr(settings, "API_COMPRESSION_BROTLI_QUALITY", 6)
+                sizes += f" br(q{quality})={len(brotli.compress(body, quality=quality))}B"
+            self.stdout.write(
+                f"/{name}/ x{rows}: serialize={serialize_ms:.2f}ms "
+                f"render stdlib={stdlib_ms:.2f}ms fast={fast_ms:.2f}ms  {sizes}"
+            )
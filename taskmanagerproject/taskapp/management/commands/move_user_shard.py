@@ -0,0 +1,107 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from taskapp import sharding
+from taskapp.cache import bump_user_version
+from taggit.models import Tag
+from taskapp.models import User, Task, Notification, TaskHistory, TaggedTask
+
+
+DELETE_BATCH_SIZE = 500
+
+
+class Command(BaseCommand):
+    help = (
+        "Move one user's tasks, notifications, history and tags to another shard and pin the user there. "
+        "Rows keep their ids. They are copied first, then the user is repointed, then the copied rows are "
+        "removed from the old shard. The move is aborted if the user writes to the old shard during the "
+        "copy, or if one of the ids is already taken on the target (see SHARD_ID_STRIDE in taskapp.sharding)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("user", help="User id or username.")
+        parser.add_argument("shard", help="Target shard alias (one of TASK_SHARDS).")
+
+    def _copy(self, obj, target, **overrides):
+        obj._state.adding = True
+        for attname, value in overrides.items():
+            setattr(obj, attname, value)
+        # raw=True keeps the id and created_at and skips the history/notification signals.
+        obj.save_base(raw=True, force_insert=True, using=target)
+        return obj.pk
+
+    def _uncopied(self, source, user, copied):
+        """Number of the user's rows on ``source`` beyond the ones in ``copied``."""
+        return sum(
+            (Task.all_objects if model is Task else model.objects).using(source).filter(user_id=user.pk).count() - len(ids)
+            for model, ids in copied.items()
+        )
+
+    def handle(self, *args, **options):
+        if not sharding.is_enabled():
+            raise CommandError("Sharding is not enabled (TASK_SHARDS is empty).")
+        target = options["shard"]
+        if target not in sharding.shards():
+            raise CommandError(f"Unknown shard {target!r}; expected one of {', '.join(sharding.shards())}.")
+        lookup = {"pk": options["user"]} if options["user"].isdigit() else {"username": options["user"]}
+        try:
+            user = User.objects.get(**lookup)
+        except User.DoesNotExist:
+            raise CommandError(f"User {options['user']!r} not found.")
+
+        source = sharding.db_for_user(user)
+        if source == target:
+            self.stdout.write(f"{user} is already on {target}.")
+            return
+
+        copied, occurrence_ids = {model: [] for model in (Task, TaskHistory, Notification, TaggedTask)}, []
+        try:
+            with transaction.atomic(using=target):
+                tasks = Task.all_objects.using(source).filter(user_id=user.pk).order_by(
+                    F("recurrence_parent").asc(nulls_first=True), "pk"
+                )
+                for task in tasks.iterator():
+                    if task.recurrence_parent_id:
+                        occurrence_ids.append(task.pk)
+                    copied[Task].append(self._copy(task, target))
+                for entry in TaskHistory.objects.using(source).filter(user_id=user.pk).order_by("pk").iterator():
+                    copied[TaskHistory].append(self._copy(entry, target))
+                for notification in Notification.objects.using(source).filter(user_id=user.pk).order_by("pk").iterator():
+                    copied[Notification].append(self._copy(notification, target))
+                for link in TaggedTask.objects.using(source).filter(user_id=user.pk).select_related("tag").iterator():
+                    tag, _ = Tag.objects.using(target).get_or_create(name=link.tag.name)
+                    copied[TaggedTask].append(self._copy(link, target, tag_id=tag.pk))
+
+                # Every task change writes history, so new rows are how writes
+                # made during the copy show up; rolling back loses nothing.
+                if self._uncopied(source, user, copied):
+                    raise CommandError(f"{user} wrote to {source} during the copy; nothing was moved, try again.")
+        except IntegrityError as exc:
+            raise CommandError(f"Some of {user}'s ids are already taken on {target}; nothing was moved ({exc}).")
+
+        user.shard = target
+        user.save(update_fields=["shard"])
+
+        # Only the copied rows are removed; anything written to the source in
+        # the moment before the user was repointed stays there and is reported.
+        occurrences = set(occurrence_ids)
+        rule_ids = [pk for pk in copied[Task] if pk not in occurrences]
+        with transaction.atomic(using=source):
+            for model, ids in [
+                (Notification, copied[Notification]),
+                (TaskHistory, copied[TaskHistory]),
+                (TaggedTask, copied[TaggedTask]),
+                (Task, occurrence_ids),
+                (Task, rule_ids),
+            ]:
+                manager = Task.all_objects if model is Task else model.objects
+                for i in range(0, len(ids), DELETE_BATCH_SIZE):
+                    manager.using(source).filter(pk__in=ids[i:i + DELETE_BATCH_SIZE])._raw_delete(source)
+        left = self._uncopied(source, user, {model: [] for model in copied})
+        if left:
+            self.stderr.write(f"{left} rows of {user} were written to {source} while moving and were left there.")
+        bump_user_version(user.pk)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Moved {len(copied[Task])} tasks of {user} from {source} to {target}; ids are unchanged."
+        ))
@@ -0,0 +1,86 @@
+from datetime import timedelta
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from taskapp import sharding
+from taskapp.cache import bump_user_version
+from taskapp.models import User, Task, Notification, TaskHistory, TaggedTask, ArchivedTaskHistory
+
+
+class Command(BaseCommand):
+    help = (
+        "Permanently remove soft-deleted tasks in bounded batches: their history is moved to "
+        "ArchivedTaskHistory in batches of rows, then notifications and task rows are deleted. Deleted "
+        "occurrences of live recurring tasks are kept, so the dates stay skipped. Also removes "
+        "task-less notifications left behind by deleted users. Safe to run repeatedly (e.g. from cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--older-than-hours", type=float, default=24,
+                            help="Only purge tasks deleted at least this long ago (default 24).")
+        parser.add_argument("--batch-size", type=int, default=500, help="Tasks, or history rows, per transaction (default 500).")
+        parser.add_argument("--max-batches", type=int, default=0, help="Stop after this many batches per database (0 = no limit).")
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options["older_than_hours"])
+        for alias in sharding.shards() or ["default"]:
+            purged = self.purge_tasks(alias, cutoff, options["batch_size"], options["max_batches"])
+            orphans = self.purge_orphan_notifications(alias, options["batch_size"])
+            self.stdout.write(f"{alias}: purged {purged} tasks, {orphans} orphaned notifications.")
+
+    def purge_tasks(self, alias, cutoff, batch_size, max_batches):
+        purged = batches = 0
+        tasks = Task.all_objects.using(alias)
+        # A deleted occurrence of a live rule is the tombstone that keeps the
+        # rule from expanding that date again; it goes with its rule.
+        purgeable = tasks.filter(
+            Q(recurrence_parent__isnull=True) | Q(recurrence_parent__deleted_at__isnull=False), deleted_at__lt=cutoff,
+        )
+        while not max_batches or batches < max_batches:
+            ids = list(purgeable.order_by("pk").values_list("pk", flat=True)[:batch_size])
+            if not ids:
+                break
+            ids += list(tasks.filter(recurrence_parent_id__in=ids).exclude(pk__in=ids).values_list("pk", flat=True))
+            user_ids = set(tasks.filter(pk__in=ids).values_list("user_id", flat=True))
+            self.archive_history(alias, ids, batch_size)
+            with transaction.atomic(using=alias):
+                Notification.objects.using(alias).filter(task_id__in=ids)._raw_delete(alias)
+                TaggedTask.objects.using(alias).filter(content_object_id__in=ids)._raw_delete(alias)
+                tasks.filter(pk__in=ids, recurrence_parent__isnull=False)._raw_delete(alias)
+                tasks.filter(pk__in=ids)._raw_delete(alias)
+            for user_id in user_ids:
+                bump_user_version(user_id)
+            purged += len(ids)
+            batches += 1
+        return purged
+
+    def archive_history(self, alias, task_ids, batch_size):
+        """Move the history of ``task_ids`` to ArchivedTaskHistory, ``batch_size`` rows per transaction."""
+        history = TaskHistory.objects.using(alias).filter(task_id__in=task_ids).order_by("pk")
+        while True:
+            with transaction.atomic(using=alias):
+                entries = list(history[:batch_size])
+                if not entries:
+                    return
+                ArchivedTaskHistory.objects.using(alias).bulk_create([
+                    ArchivedTaskHistory(
+                        user_id=entry.user_id, task_id=entry.task_id, action=entry.action, version=entry.version,
+                        changes=entry.changes, snapshot=entry.snapshot, created_at=entry.created_at,
+                    )
+                    for entry in entries
+                ])
+                TaskHistory.objects.using(alias).filter(pk__in=[entry.pk for entry in entries])._raw_delete(alias)
+
+    def purge_orphan_notifications(self, alias, batch_size):
+        notifications = Notification.objects.using(alias).filter(task__isnull=True)
+        user_ids = set(notifications.values_list("user_id", flat=True).distinct())
+        existing = set(User.objects.filter(pk__in=user_ids).values_list("pk", flat=True))
+        removed = 0
+        for user_id in user_ids - existing:
+            while True:
+                ids = list(notifications.filter(user_id=user_id).values_list("pk", flat=True)[:batch_size])
+                if not ids:
+                    break
+                removed += Notification.objects.using(alias).filter(pk__in=ids)._raw_delete(alias)
+        return removed
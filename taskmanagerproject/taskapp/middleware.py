@@ -0,0 +1,139 @@
+import cProfile
+import random
+import time
+from contextlib import ExitStack
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_string
+from rest_framework.exceptions import APIException
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from .profiling import QueryRecorder, save_profile
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - gzip only
+    brotli = None
+
+
+def _accepted_encodings(header):
+    accepted = set()
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        q = params.strip()
+        if q.startswith("q="):
+            try:
+                if float(q[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(coding.strip().lower())
+    return accepted
+
+
+class APICompressionMiddleware:
+    """
+    Compress JSON API responses bigger than API_COMPRESSION_MIN_SIZE bytes,
+    using brotli when the client accepts it and the library is installed and
+    gzip otherwise. Static files are left to WhiteNoise.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.min_size = getattr(settings, "API_COMPRESSION_MIN_SIZE", 1024)
+        self.brotli_quality = getattr(settings, "API_COMPRESSION_BROTLI_QUALITY", 6)
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if response.streaming or response.has_header("Content-Encoding"):
+            return response
+        if not response.get("Content-Type", "").startswith("application/json"):
+            return response
+
+        patch_vary_headers(response, ("Accept-Encoding",))
+        if len(response.content) < self.min_size:
+            return response
+
+        accepted = _accepted_encodings(request.META.get("HTTP_ACCEPT_ENCODING", ""))
+        if brotli is not None and "br" in accepted:
+            compressed, encoding = brotli.compress(response.content, quality=self.brotli_quality), "br"
+        elif "gzip" in accepted:
+            compressed, encoding = compress_string(response.content), "gzip"
+        else:
+            return response
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response["Content-Length"] = str(len(compressed))
+        response["Content-Encoding"] = encoding
+        etag = response.get("ETag")
+        if etag and etag.startswith('"'):
+            response["ETag"] = "W/" + etag
+        return response
+
+
+class RequestProfilingMiddleware:
+    """
+    Profile single requests with cProfile and record their SQL (see
+    taskapp.profiling). Staff ask for it with an ``X-Profile`` header or a
+    ``_profile`` query parameter; REQUEST_PROFILING_SAMPLE_RATE = N also
+    profiles one in N requests of any user. Not installed at all unless
+    REQUEST_PROFILING is on.
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, "REQUEST_PROFILING", False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.sample_rate = getattr(settings, "REQUEST_PROFILING_SAMPLE_RATE", 0)
+
+    def __call__(self, request):
+        trigger = self.get_trigger(request)
+        if trigger is None:
+            return self.get_response(request)
+
+        queries = []
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:
+            # From Python 3.12 only one profiler can be active per process, so
+            # a request overlapping another profiled one (threaded workers) is
+            # served unprofiled.
+            return self.get_response(request)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for alias in connections:
+                    stack.enter_context(connections[alias].execute_wrapper(QueryRecorder(alias, queries)))
+                response = self.get_response(request)
+        finally:
+            profiler.disable()
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        profile_id = save_profile(request, response, profiler, queries, elapsed_ms, trigger)
+        if trigger != "sample":
+            response["X-Profile-Id"] = profile_id
+        return response
+
+    def get_trigger(self, request):
+        if "HTTP_X_PROFILE" in request.META:
+            trigger = "header"
+        elif "_profile" in request.GET:
+            trigger = "query"
+        elif self.sample_rate > 0 and random.randrange(self.sample_rate) == 0:
+            return "sample"
+        else:
+            return None
+        return trigger if self.is_staff(request) else None
+
+    def is_staff(self, request):
+        user = getattr(request, "user", None)
+        if user is not None and user.is_authenticated:
+            return user.is_staff
+        try:
+            result = JWTAuthentication().authenticate(request)
+        except APIException:
+            return False
+        return result is not None and result[0].is_staff
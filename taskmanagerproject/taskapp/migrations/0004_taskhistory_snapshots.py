@@ -0,0 +1,53 @@
+# Generated by Django 4.2.7 on 2026-10-19 19:20
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_versions(apps, schema_editor):
+    TaskHistory = apps.get_model("taskapp", "TaskHistory")
+    history = TaskHistory.objects.using(schema_editor.connection.alias)
+    every = settings.TASK_HISTORY_SNAPSHOT_EVERY
+    batch, task_id, state, version = [], None, {}, 0
+    for entry in history.order_by("task_id", "created_at", "id").iterator(chunk_size=2000):
+        if entry.task_id != task_id:
+            task_id, state, version = entry.task_id, {}, 0
+        version += 1
+        if entry.action == "updated":
+            for field, (old, new) in entry.changes.items():
+                state[field] = new
+        else:
+            state = dict(entry.changes)
+        entry.version = version
+        entry.snapshot = dict(state) if version == 1 or version % every == 0 else None
+        batch.append(entry)
+        if len(batch) >= 500:
+            history.bulk_update(batch, ["version", "snapshot"])
+            batch = []
+    if batch:
+        history.bulk_update(batch, ["version", "snapshot"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taskapp', '0003_task_recurrence'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='taskhistory',
+            name='snapshot',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='taskhistory',
+            name='version',
+            field=models.PositiveIntegerField(default=1),
+        ),
+        migrations.AddIndex(
+            model_name='taskhistory',
+            index=models.Index(fields=['task', 'version'], name='taskapp_tas_task_id_aa9774_idx'),
+        ),
+        migrations.RunPython(backfill_versions, migrations.RunPython.noop),
+    ]
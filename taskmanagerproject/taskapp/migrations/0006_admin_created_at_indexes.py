@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-19 19:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taskapp', '0005_user_sharding'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(fields=['created_at'], name='taskapp_not_created_c8fa91_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='taskhistory',
+            index=models.Index(fields=['created_at'], name='taskapp_tas_created_ddc438_idx'),
+        ),
+    ]
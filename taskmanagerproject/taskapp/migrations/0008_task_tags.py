@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-19 19:30
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import taggit.managers
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taggit', '0006_rename_taggeditem_content_type_object_id_taggit_tagg_content_8fc721_idx'),
+        ('taskapp', '0007_task_soft_delete'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaggedTask',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_object', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tagged_items', to='taskapp.task')),
+                ('tag', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='%(app_label)s_%(class)s_items', to='taggit.tag')),
+                ('user', models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.DO_NOTHING, related_name='task_tags', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='tags',
+            field=taggit.managers.TaggableManager(blank=True, help_text='A comma-separated list of tags.', through='taskapp.TaggedTask', to='taggit.Tag', verbose_name='Tags'),
+        ),
+        migrations.AddIndex(
+            model_name='taggedtask',
+            index=models.Index(fields=['user', 'tag'], name='taskapp_tag_user_id_e86fc3_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='taggedtask',
+            constraint=models.UniqueConstraint(fields=('content_object', 'tag'), name='unique_task_tag'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-19 19:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taskapp', '0008_task_tags'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['user', 'due_date'], name='taskapp_tas_user_id_c5b0ab_idx'),
+        ),
+    ]
@@ -0,0 +1,75 @@
+# Generated by Django 4.2.7 on 2026-10-19 20:05
+
+from django.db import migrations, models
+
+PRIORITY_CODES = {"low": 1, "medium": 2, "high": 3}
+STATUS_CODES = {"todo": 1, "in_progress": 2, "done": 3}
+
+
+def names_to_codes(apps, schema_editor):
+    Task = apps.get_model("taskapp", "Task")
+    tasks = Task.objects.using(schema_editor.connection.alias)
+    for name, code in PRIORITY_CODES.items():
+        tasks.filter(priority__iexact=name).update(priority_code=code)
+    for name, code in STATUS_CODES.items():
+        tasks.filter(status__iexact=name).update(status_code=code)
+
+
+def codes_to_names(apps, schema_editor):
+    Task = apps.get_model("taskapp", "Task")
+    tasks = Task.objects.using(schema_editor.connection.alias)
+    for name, code in PRIORITY_CODES.items():
+        tasks.filter(priority_code=code).update(priority=name)
+    for name, code in STATUS_CODES.items():
+        tasks.filter(status_code=code).update(status=name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taskapp', '0009_task_user_due_date_index'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='task',
+            name='taskapp_tas_user_id_f21f9d_idx',
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='priority_code',
+            field=models.PositiveSmallIntegerField(choices=[(1, 'Low'), (2, 'Medium'), (3, 'High')], default=2),
+        ),
+        migrations.AddField(
+            model_name='task',
+            name='status_code',
+            field=models.PositiveSmallIntegerField(choices=[(1, 'To Do'), (2, 'In Progress'), (3, 'Done')], default=1),
+        ),
+        migrations.RunPython(names_to_codes, codes_to_names),
+        migrations.RemoveField(
+            model_name='task',
+            name='priority',
+        ),
+        migrations.RemoveField(
+            model_name='task',
+            name='status',
+        ),
+        migrations.RenameField(
+            model_name='task',
+            old_name='priority_code',
+            new_name='priority',
+        ),
+        migrations.RenameField(
+            model_name='task',
+            old_name='status_code',
+            new_name='status',
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['user', 'status', 'priority'], name='taskapp_tas_user_id_d98af6_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['user', 'priority'], name='taskapp_tas_user_id_a26abf_idx'),
+        ),
+    ]
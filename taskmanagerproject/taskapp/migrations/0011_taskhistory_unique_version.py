@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-19 19:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taskapp', '0010_task_priority_status_codes'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='taskhistory',
+            name='taskapp_tas_task_id_aa9774_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='taskhistory',
+            constraint=models.UniqueConstraint(fields=('task', 'version'), name='unique_task_history_version'),
+        ),
+    ]
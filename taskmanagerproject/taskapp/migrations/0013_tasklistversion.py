@@ -0,0 +1,20 @@
+# Generated by Django 4.2.7 on 2026-10-19 20:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taskapp', '0012_throttlebucket'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskListVersion',
+            fields=[
+                ('user_id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('version', models.BigIntegerField()),
+            ],
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-19 20:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('taskapp', '0013_tasklistversion'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='archivedtaskhistory',
+            index=models.Index(fields=['created_at'], name='taskapp_arc_created_4af389_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['title'], name='taskapp_tas_title_a11a54_idx'),
+        ),
+    ]
@@ -1,45 +1,150 @@
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.utils import timezone
+from taggit.managers import TaggableManager
+from taggit.models import TaggedItemBase
+from . import sharding
 
-PRIORITY_CHOICES = [("low", "Low"), ("medium", "Medium"), ("high", "High")]
-STATUS_CHOICES = [("todo", "To Do"), ("in_progress", "In Progress"), ("done", "Done")]
+# Priority and status are stored as small integer codes in semantic order;
+# the API, forms and task history use the names below.
+PRIORITY_LOW, PRIORITY_MEDIUM, PRIORITY_HIGH = 1, 2, 3
+PRIORITY_CHOICES = [(PRIORITY_LOW, "Low"), (PRIORITY_MEDIUM, "Medium"), (PRIORITY_HIGH, "High")]
+PRIORITY_NAMES = {PRIORITY_LOW: "low", PRIORITY_MEDIUM: "medium", PRIORITY_HIGH: "high"}
+PRIORITY_CODES = {name: code for code, name in PRIORITY_NAMES.items()}
+STATUS_TODO, STATUS_IN_PROGRESS, STATUS_DONE = 1, 2, 3
+STATUS_CHOICES = [(STATUS_TODO, "To Do"), (STATUS_IN_PROGRESS, "In Progress"), (STATUS_DONE, "Done")]
+STATUS_NAMES = {STATUS_TODO: "todo", STATUS_IN_PROGRESS: "in_progress", STATUS_DONE: "done"}
+STATUS_CODES = {name: code for code, name in STATUS_NAMES.items()}
+RECURRENCE_DAILY, RECURRENCE_WEEKLY, RECURRENCE_MONTHLY = "daily", "weekly", "monthly"
+RECURRENCE_CHOICES = [("", "Does not repeat"), (RECURRENCE_DAILY, "Daily"), (RECURRENCE_WEEKLY, "Weekly"), (RECURRENCE_MONTHLY, "Monthly")]
 
 class User(AbstractUser):
     email = models.EmailField(unique=True)
+    # Pinned shard alias for this user's tasks; blank = placed by user id hash.
+    shard = models.CharField(max_length=50, blank=True, default="")
     def __str__(self): 
         return self.username
 
 
+class UserScopedQuerySet(models.QuerySet):
+    def for_user(self, user):
+        """Rows owned by ``user``, read from the shard that holds them."""
+        qs = self.filter(user=user)
+        alias = sharding.db_for_user(user)
+        return qs.using(alias) if alias else qs
+
+    def create(self, **kwargs):
+        # QuerySet.create() saves with an explicit alias, bypassing the router.
+        if self._db is None and kwargs.get("user") is not None:
+            alias = sharding.db_for_user(kwargs["user"])
+            if alias:
+                return self.using(alias).create(**kwargs)
+        return super().create(**kwargs)
+
+
+class TaskManager(models.Manager.from_queryset(UserScopedQuerySet)):
+    def get_queryset(self):
+        return super().get_queryset().filter(deleted_at__isnull=True)
+
+
 class Task(models.Model):
-    user = models.ForeignKey("taskapp.User", on_delete=models.CASCADE, related_name="tasks")
+    # Users live on "default" while tasks may live on a shard, so the FKs to
+    # User on sharded models are not enforced by the database. Deleting a user
+    # only tombstones their tasks; purge_deleted_tasks removes the rows later.
+    user = models.ForeignKey("taskapp.User", on_delete=models.DO_NOTHING, related_name="tasks", db_constraint=False)
     title = models.CharField(max_length=200)
     description = models.TextField(blank=True)
-    priority = models.CharField(max_length=10, choices=PRIORITY_CHOICES, default="medium")
-    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="todo")
+    priority = models.PositiveSmallIntegerField(choices=PRIORITY_CHOICES, default=PRIORITY_MEDIUM)
+    status = models.PositiveSmallIntegerField(choices=STATUS_CHOICES, default=STATUS_TODO)
     due_date = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     completed_at = models.DateTimeField(null=True, blank=True)
 
+    # A task with a recurrence rule stands for its first occurrence (due_date);
+    # later occurrences are expanded on read and only saved once touched.
+    recurrence = models.CharField(max_length=10, choices=RECURRENCE_CHOICES, blank=True, default="")
+    recurrence_end = models.DateTimeField(null=True, blank=True)
+    recurrence_parent = models.ForeignKey("self", on_delete=models.CASCADE, related_name="occurrences", null=True, blank=True)
+    occurrence_date = models.DateTimeField(null=True, blank=True)
+    deleted_at = models.DateTimeField(null=True, blank=True, db_index=True)
+    tags = TaggableManager(through="taskapp.TaggedTask", blank=True)
+
+    objects = TaskManager()
+    all_objects = UserScopedQuerySet.as_manager()
+
     class Meta:
         indexes = [
-            models.Index(fields=["user", "status"]),
+            models.Index(fields=["user", "status", "priority"]),
+            models.Index(fields=["user", "priority"]),
+            models.Index(fields=["user", "recurrence"]),
+            models.Index(fields=["user", "due_date"]),
             models.Index(fields=["due_date"]),
             models.Index(fields=["created_at"]),
             models.Index(fields=["completed_at"]),
+            models.Index(fields=["title"]),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=["recurrence_parent", "occurrence_date"], name="unique_task_occurrence"),
         ]
         ordering = ["-created_at"]
 
     def __str__(self):
         return f"{self.title} ({self.user})"
 
+    @property
+    def priority_name(self):
+        return PRIORITY_NAMES.get(self.priority, self.priority)
+
+    @property
+    def status_name(self):
+        return STATUS_NAMES.get(self.status, self.status)
+
+    def soft_delete(self):
+        """Tombstone the task and its occurrences; rows are purged later in batches."""
+        self.deleted_at = timezone.now()
+        self.save(update_fields=["deleted_at"])
+        Task.objects.using(self._state.db).filter(recurrence_parent=self).update(deleted_at=self.deleted_at)
+
+class TaggedTask(TaggedItemBase):
+    """Task/tag link, with the owner denormalized so tag filters and facets stay on the (user, tag) index."""
+    content_object = models.ForeignKey("taskapp.Task", on_delete=models.CASCADE, related_name="tagged_items")
+    user = models.ForeignKey("taskapp.User", on_delete=models.DO_NOTHING, related_name="task_tags", db_constraint=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user", "tag"]),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=["content_object", "tag"], name="unique_task_tag"),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.user_id is None:
+            self.user_id = self.content_object.user_id
+        super().save(*args, **kwargs)
+
+    @classmethod
+    def tags_for(cls, model, instance=None, **extra_filters):
+        # Tags live next to their links on the task's shard; the router has no
+        # instance hint for Tag queries and would read them from "default".
+        tags = super().tags_for(model, instance, **extra_filters)
+        if instance is not None and instance._state.db:
+            tags = tags.using(instance._state.db)
+        return tags
+
 class Notification(models.Model):
-    user = models.ForeignKey("taskapp.User", on_delete=models.CASCADE, related_name="notifications")
+    user = models.ForeignKey("taskapp.User", on_delete=models.DO_NOTHING, related_name="notifications", db_constraint=False)
     task = models.ForeignKey("taskapp.Task", on_delete=models.CASCADE, related_name="notifications", null=True, blank=True)
     message = models.CharField(max_length=255)
     is_read = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = UserScopedQuerySet.as_manager()
+
     class Meta:
+        indexes = [
+            models.Index(fields=["created_at"]),
+        ]
         ordering = ["-created_at"]
 
     def __str__(self):
@@ -47,15 +152,69 @@ class Notification(models.Model):
 
 class TaskHistory(models.Model):
     ACTION_CHOICES = [("created", "Created"), ("updated", "Updated"), ("deleted", "Deleted")]
-    user = models.ForeignKey("taskapp.User", on_delete=models.CASCADE, related_name="task_histories")
+    user = models.ForeignKey("taskapp.User", on_delete=models.DO_NOTHING, related_name="task_histories", db_constraint=False)
     task = models.ForeignKey("taskapp.Task", on_delete=models.CASCADE, related_name="histories")
     action = models.CharField(max_length=10, choices=ACTION_CHOICES)
     changes = models.JSONField(default=dict, blank=True)
+    # Per-task sequence number; every TASK_HISTORY_SNAPSHOT_EVERY versions
+    # (and on creation) the full tracked state is stored next to the diff.
+    version = models.PositiveIntegerField(default=1)
+    snapshot = models.JSONField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
+    objects = UserScopedQuerySet.as_manager()
+
     class Meta:
+        indexes = [
+            models.Index(fields=["created_at"]),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=["task", "version"], name="unique_task_history_version"),
+        ]
         ordering = ["-created_at"]
 
     def __str__(self):
         return f"History({self.action}) for Task {self.task_id} by {self.user}"
 
+
+
+class ArchivedTaskHistory(models.Model):
+    """History of purged tasks, kept for audit once the task rows are gone."""
+    user_id = models.BigIntegerField()
+    task_id = models.BigIntegerField()
+    action = models.CharField(max_length=10, choices=TaskHistory.ACTION_CHOICES)
+    version = models.PositiveIntegerField(default=1)
+    changes = models.JSONField(default=dict, blank=True)
+    snapshot = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["user_id", "task_id"]),
+            models.Index(fields=["created_at"]),
+        ]
+        ordering = ["-created_at"]
+
+    def __str__(self):
+        return f"ArchivedHistory({self.action}) for Task {self.task_id}"
+
+
+class ThrottleBucket(models.Model):
+    """Token bucket of one throttle scope and client (see taskapp.throttling)."""
+    key = models.CharField(max_length=200, unique=True)
+    tokens = models.FloatField()
+    # Unix time of the last update, as returned by TokenBucketThrottle.timer.
+    stamp = models.FloatField(db_index=True)
+
+    def __str__(self):
+        return f"{self.key}: {self.tokens:.2f}"
+
+
+class TaskListVersion(models.Model):
+    """Current version of a user's task lists; cached lists of older versions are never served (see taskapp.cache)."""
+    user_id = models.BigIntegerField(primary_key=True)
+    version = models.BigIntegerField()
+
+    def __str__(self):
+        return f"Task lists of user {self.user_id}: v{self.version}"
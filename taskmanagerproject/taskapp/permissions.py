@@ -6,9 +6,10 @@ class IsOwner(BasePermission):
         return bool(request.user and request.user.is_authenticated)
 
     def has_object_permission(self, request, view, obj):
-        if hasattr(obj, "user"):
-            return obj.user == request.user
-        if hasattr(obj, "owner"):
-            return obj.owner == request.user
+        # Compare ids so the owner row is never loaded just to check it.
+        if hasattr(obj, "user_id"):
+            return obj.user_id == request.user.pk
+        if hasattr(obj, "owner_id"):
+            return obj.owner_id == request.user.pk
         return False
 
@@ -0,0 +1,101 @@
+import io
+import json
+import pstats
+import re
+import time
+import uuid
+from pathlib import Path
+from django.conf import settings
+from django.utils import timezone
+
+PROFILE_ID_RE = re.compile(r"^\d{8}-\d{6}-\d{9}-[0-9a-f]{8}$")
+TOP_FUNCTIONS = 40
+
+
+def profile_dir():
+    return Path(settings.REQUEST_PROFILING_DIR)
+
+
+def profile_path(profile_id, suffix):
+    """Path of one profile file, or None for ids that did not come from here."""
+    if not PROFILE_ID_RE.match(profile_id):
+        return None
+    return profile_dir() / f"{profile_id}{suffix}"
+
+
+class QueryRecorder:
+    """``execute_wrapper`` that records the SQL and duration of every query, without parameters."""
+
+    def __init__(self, alias, queries):
+        self.alias = alias
+        self.queries = queries
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                "db": self.alias,
+                "sql": sql,
+                "many": many,
+                "ms": round((time.perf_counter() - start) * 1000, 3),
+            })
+
+
+def new_profile_id():
+    """UTC timestamp down to the nanosecond plus a random tag, so ids sort by creation time."""
+    seconds, nanos = divmod(time.time_ns(), 10**9)
+    return f"{time.strftime('%Y%m%d-%H%M%S', time.gmtime(seconds))}-{nanos:09d}-{uuid.uuid4().hex[:8]}"
+
+
+def save_profile(request, response, profiler, queries, elapsed_ms, trigger):
+    """Write ``<id>.prof`` (pstats) and ``<id>.json`` (request, SQL, top functions); return the id."""
+    directory = profile_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    profile_id = new_profile_id()
+    profiler.dump_stats(directory / f"{profile_id}.prof")
+
+    top = io.StringIO()
+    pstats.Stats(profiler, stream=top).sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+    user = getattr(request, "user", None)
+    summary = {
+        "id": profile_id,
+        "created_at": timezone.now().isoformat(),
+        "method": request.method,
+        "path": request.path,
+        "status": response.status_code,
+        "user_id": user.pk if user is not None and user.is_authenticated else None,
+        "trigger": trigger,
+        "total_ms": round(elapsed_ms, 3),
+        "sql_count": len(queries),
+        "sql_ms": round(sum(q["ms"] for q in queries), 3),
+        "queries": queries,
+        "top_functions": top.getvalue(),
+    }
+    (directory / f"{profile_id}.json").write_text(json.dumps(summary, indent=1))
+    rotate_profiles(settings.REQUEST_PROFILING_KEEP)
+    return profile_id
+
+
+def rotate_profiles(keep):
+    for path in sorted(profile_dir().glob("*.json"), reverse=True)[keep:]:
+        path.unlink(missing_ok=True)
+        path.with_suffix(".prof").unlink(missing_ok=True)
+
+
+def list_profiles():
+    """Summaries of the stored profiles, newest first, without the bulky fields."""
+    directory = profile_dir()
+    if not directory.is_dir():
+        return []
+    profiles = []
+    for path in sorted(directory.glob("*.json"), reverse=True):
+        try:
+            summary = json.loads(path.read_text())
+        except (OSError, ValueError):
+            continue
+        summary.pop("queries", None)
+        summary.pop("top_functions", None)
+        profiles.append(summary)
+    return profiles
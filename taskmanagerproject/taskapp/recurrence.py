@@ -0,0 +1,165 @@
+import calendar
+from datetime import timedelta
+from itertools import islice
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from .models import Task, RECURRENCE_DAILY, RECURRENCE_WEEKLY, RECURRENCE_MONTHLY
+
+# Hard cap on virtual occurrences built for a single list request.
+MAX_EXPANDED_OCCURRENCES = 1000
+
+OCCURRENCE_COPY_FIELDS = ["title", "description", "priority"]
+
+_STEPS = {
+    RECURRENCE_DAILY: timedelta(days=1),
+    RECURRENCE_WEEKLY: timedelta(weeks=1),
+}
+
+
+def _add_months(dt, months):
+    month_index = dt.month - 1 + months
+    year, month = dt.year + month_index // 12, month_index % 12 + 1
+    day = min(dt.day, calendar.monthrange(year, month)[1])
+    return dt.replace(year=year, month=month, day=day)
+
+
+def nth_occurrence(rule: Task, n: int):
+    if rule.recurrence == RECURRENCE_MONTHLY:
+        return _add_months(rule.due_date, n)
+    return rule.due_date + _STEPS[rule.recurrence] * n
+
+
+def _first_index_at_or_after(rule: Task, start):
+    anchor = rule.due_date
+    if start <= anchor:
+        return 0
+    if rule.recurrence == RECURRENCE_MONTHLY:
+        n = (start.year - anchor.year) * 12 + (start.month - anchor.month)
+        n = max(n - 1, 0)
+    else:
+        n = int((start - anchor) / _STEPS[rule.recurrence])
+    while nth_occurrence(rule, n) < start:
+        n += 1
+    return n
+
+
+def occurrence_dates(rule: Task, start, end):
+    """Yield due dates of ``rule`` in ``[start, end]``, skipping the anchor row itself."""
+    if not rule.recurrence or rule.due_date is None:
+        return
+    if rule.recurrence_end is not None and rule.recurrence_end < end:
+        end = rule.recurrence_end
+    n = max(_first_index_at_or_after(rule, start), 1)
+    while True:
+        when = nth_occurrence(rule, n)
+        if when > end:
+            return
+        yield when
+        n += 1
+
+
+def is_occurrence(rule: Task, when):
+    if not rule.recurrence or rule.due_date is None or when <= rule.due_date:
+        return False
+    if rule.recurrence_end is not None and when > rule.recurrence_end:
+        return False
+    return nth_occurrence(rule, _first_index_at_or_after(rule, when)) == when
+
+
+def virtual_occurrence(rule: Task, when):
+    """Unsaved Task standing in for one pending occurrence of ``rule``."""
+    return Task(
+        user_id=rule.user_id,
+        recurrence_parent=rule,
+        occurrence_date=when,
+        due_date=when,
+        **{f: getattr(rule, f) for f in OCCURRENCE_COPY_FIELDS},
+    )
+
+
+def pending_dates(rules, start, end):
+    """
+    ``(rule, due date)`` of every occurrence of ``rules`` in ``[start, end]``
+    that has not been materialized (or deleted). Not capped: the window
+    bounds the work per rule.
+    """
+    rules = list(rules)
+    if not rules:
+        return
+    materialized = set(
+        Task.all_objects.using(rules[0]._state.db).filter(recurrence_parent__in=rules, occurrence_date__range=(start, end))
+        .values_list("recurrence_parent_id", "occurrence_date")
+    )
+    for rule in rules:
+        for when in occurrence_dates(rule, start, end):
+            if (rule.pk, when) not in materialized:
+                yield rule, when
+
+
+def expand(rules, start, end):
+    """Virtual occurrences of ``rules`` in ``[start, end]`` that have not been materialized (or deleted)."""
+    pending = islice(pending_dates(rules, start, end), MAX_EXPANDED_OCCURRENCES)
+    return [virtual_occurrence(rule, when) for rule, when in pending]
+
+
+def sort_tasks(tasks, ordering):
+    """Sort ``tasks`` in place by OrderingFilter fields; nulls sort last ascending and first descending."""
+    for field in reversed(ordering):
+        name = field.lstrip("-")
+        tasks.sort(key=lambda t: (getattr(t, name) is None, getattr(t, name)), reverse=field.startswith("-"))
+    return tasks
+
+
+class TasksWithOccurrences:
+    """
+    Rows of ``queryset`` and virtual ``occurrences`` as one list sorted by
+    ``ordering``, for the paginator. A slice reads at most its own length
+    plus len(occurrences) rows, starting near the slice instead of the top.
+    """
+
+    def __init__(self, queryset, occurrences, ordering):
+        self.ordering = ordering
+        self.occurrences = sort_tasks(list(occurrences), ordering)
+        order_by = [
+            F(field[1:]).desc(nulls_first=True) if field.startswith("-") else F(field).asc(nulls_last=True)
+            for field in ordering
+        ]
+        self.queryset = queryset.order_by(*order_by, "pk")
+
+    def count(self):
+        return self.queryset.count() + len(self.occurrences)
+
+    __len__ = count
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        start, stop = index.start or 0, index.stop
+        # At most len(occurrences) entries come before the row at ``skip``.
+        skip = max(0, start - len(self.occurrences))
+        rows = list(self.queryset[skip:stop])
+        occurrences, offset = self.occurrences, 0
+        if skip:
+            if not rows:
+                return []
+            # Rows sort before occurrences they tie with.
+            before = sort_tasks([rows[0], *occurrences], self.ordering).index(rows[0])
+            occurrences, offset = occurrences[before:], skip + before
+        merged = sort_tasks(rows + occurrences, self.ordering)
+        return merged[start - offset:None if stop is None else stop - offset]
+
+
+def materialize(rule: Task, when):
+    """Return the real row for one occurrence of ``rule``, creating it on first use."""
+    using = rule._state.db
+    existing = Task.all_objects.using(using).filter(recurrence_parent=rule, occurrence_date=when).first()
+    if existing is not None:
+        return existing
+    occurrence = virtual_occurrence(rule, when)
+    try:
+        with transaction.atomic(using=using):
+            occurrence.save(using=using)
+            occurrence.tags.set(list(rule.tags.all()))
+    except IntegrityError:
+        return Task.all_objects.using(using).get(recurrence_parent=rule, occurrence_date=when)
+    return occurrence
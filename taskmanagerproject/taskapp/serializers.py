@@ -1,6 +1,7 @@
 from django.contrib.auth import get_user_model
 from rest_framework import serializers
-from .models import Task, Notification, TaskHistory
+from taggit.serializers import TaggitSerializer, TagListSerializerField
+from .models import Task, Notification, TaskHistory, PRIORITY_NAMES, STATUS_NAMES
 
 User = get_user_model()
 
@@ -31,8 +32,37 @@ class RegisterSerializer(serializers.ModelSerializer):
         user.save()
         return user
 
-class TaskSerializer(serializers.ModelSerializer):
-    user_id = serializers.IntegerField(source="user.id", read_only=True)
+class CodeNameField(serializers.ChoiceField):
+    """Integer-coded model field read and written by name (e.g. priority 3 <-> "high")."""
+
+    def __init__(self, names, **kwargs):
+        self.names = names
+        self.codes = {name: code for code, name in names.items()}
+        super().__init__(choices=list(self.codes), **kwargs)
+
+    def to_internal_value(self, data):
+        return self.codes[super().to_internal_value(data)]
+
+    def to_representation(self, value):
+        return self.names.get(value, value)
+
+
+class TaskTagsField(TagListSerializerField):
+    def get_attribute(self, instance):
+        # Virtual (unsaved) recurrence occurrences carry their rule's tags.
+        if instance.pk is None and instance.recurrence_parent_id:
+            instance = instance.recurrence_parent
+        return super().get_attribute(instance)
+
+    def to_representation(self, value):
+        return sorted(tag.name for tag in value.all())
+
+
+class TaskSerializer(TaggitSerializer, serializers.ModelSerializer):
+    user_id = serializers.IntegerField(read_only=True)
+    priority = CodeNameField(PRIORITY_NAMES, required=False)
+    status = CodeNameField(STATUS_NAMES, required=False)
+    tags = TaskTagsField(required=False)
     id = serializers.IntegerField(read_only=True)
 
     class Meta:
@@ -47,8 +77,25 @@ class TaskSerializer(serializers.ModelSerializer):
             "due_date",
             "created_at",
             "completed_at",
+            "recurrence",
+            "recurrence_end",
+            "recurrence_parent",
+            "occurrence_date",
+            "tags",
         ]
-        read_only_fields = ["id", "user_id", "created_at", "completed_at"]
+        read_only_fields = ["id", "user_id", "created_at", "completed_at", "recurrence_parent", "occurrence_date"]
+
+    def validate(self, attrs):
+        recurrence = attrs.get("recurrence", getattr(self.instance, "recurrence", ""))
+        due_date = attrs.get("due_date", getattr(self.instance, "due_date", None))
+        recurrence_end = attrs.get("recurrence_end", getattr(self.instance, "recurrence_end", None))
+        if recurrence and due_date is None:
+            raise serializers.ValidationError({"due_date": "A recurring task needs a due date."})
+        if recurrence and getattr(self.instance, "recurrence_parent_id", None):
+            raise serializers.ValidationError({"recurrence": "An occurrence cannot have its own recurrence."})
+        if recurrence_end and due_date and recurrence_end < due_date:
+            raise serializers.ValidationError({"recurrence_end": "Must not be before the due date."})
+        return attrs
 
     def create(self, validated_data):
         validated_data["user"] = self.context["request"].user
@@ -65,6 +112,6 @@ class TaskHistorySerializer(serializers.ModelSerializer):
 
     class Meta:
         model = TaskHistory
-        fields = ["id", "task_id", "action", "changes", "created_at"]
+        fields = ["id", "task_id", "action", "version", "changes", "created_at"]
         read_only_fields = fields
 
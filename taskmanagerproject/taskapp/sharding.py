@@ -0,0 +1,122 @@
+"""
+Optional user-hash sharding of Task, Notification, TaskHistory and TaggedTask.
+
+With ``TASK_SHARDS`` empty (the default) everything lives in ``default`` and
+these helpers are no-ops. Otherwise each user's rows live on one shard: the
+alias in ``User.shard`` if set (see ``manage.py move_user_shard``), else a
+stable hash of the user id. Users and everything else stay on ``default``.
+"""
+
+import zlib
+from django.apps import apps
+from django.conf import settings
+from django.db import connections
+
+SHARDED_MODELS = {"task", "notification", "taskhistory", "taggedtask"}
+
+# Shard number i allocates ids of sharded rows congruent to i + 1 modulo
+# SHARD_ID_STRIDE, so ids stay unique across shards and move_user_shard can
+# keep them. MySQL shards get the stride from their connection settings.
+# Rows created before sharding may still clash; the move then aborts.
+# SQLite shards (local testing only) allocate ids one by one.
+SHARD_ID_STRIDE = 64
+
+
+def shards():
+    return list(getattr(settings, "TASK_SHARDS", []))
+
+
+def is_enabled():
+    return bool(shards())
+
+
+def is_sharded_model(model):
+    return model._meta.app_label == "taskapp" and model._meta.model_name in SHARDED_MODELS
+
+
+def hashed_shard(user_id):
+    aliases = shards()
+    return aliases[zlib.crc32(str(user_id).encode()) % len(aliases)]
+
+
+def db_for_user(user):
+    """Shard alias holding ``user``'s rows, or None when sharding is off."""
+    if not is_enabled() or user is None or user.pk is None:
+        return None
+    return getattr(user, "shard", "") or hashed_shard(user.pk)
+
+
+def db_for_user_id(user_id):
+    if not is_enabled():
+        return None
+    from .models import User
+
+    shard = User.objects.using("default").filter(pk=user_id).values_list("shard", flat=True).first()
+    return shard or hashed_shard(user_id)
+
+
+def db_for_instance(obj):
+    if obj._state.db:
+        return obj._state.db
+    user = obj._meta.get_field("user").get_cached_value(obj, None)
+    if user is not None:
+        return db_for_user(user)
+    task = obj._meta.get_field("task").get_cached_value(obj, None) if hasattr(obj, "task_id") else None
+    if task is not None and task._state.db:
+        return task._state.db
+    return db_for_user_id(obj.user_id)
+
+
+def sharded_models():
+    return [apps.get_model("taskapp", name) for name in sorted(SHARDED_MODELS)]
+
+
+def id_offset(alias):
+    """Residue of the ids ``alias`` allocates for sharded rows, or None if it is not a shard."""
+    aliases = shards()
+    return aliases.index(alias) + 1 if alias in aliases else None
+
+
+def next_id_at_or_after(alias, value):
+    offset = id_offset(alias)
+    return value + (offset - value) % SHARD_ID_STRIDE
+
+
+def configure_id_sequences(alias):
+    """Make the PostgreSQL identity columns of the sharded tables on ``alias`` step through its residue class."""
+    connection = connections[alias]
+    if id_offset(alias) is None or connection.vendor != "postgresql":
+        return
+    quote = connection.ops.quote_name
+    with connection.cursor() as cursor:
+        for model in sharded_models():
+            table, column = quote(model._meta.db_table), quote(model._meta.pk.column)
+            cursor.execute(f"SELECT COALESCE(MAX({column}), 0) FROM {table}")
+            start = next_id_at_or_after(alias, cursor.fetchone()[0] + 1)
+            cursor.execute(
+                f"ALTER TABLE {table} ALTER COLUMN {column} SET INCREMENT BY {SHARD_ID_STRIDE} RESTART WITH {int(start)}"
+            )
+
+
+class UserShardRouter:
+    """Send sharded models to their user's shard; everything else to ``default``."""
+
+    def db_for_read(self, model, **hints):
+        if not is_sharded_model(model):
+            return "default"
+        instance = hints.get("instance")
+        if instance is not None and is_sharded_model(type(instance)):
+            return db_for_instance(instance)
+        return None
+
+    db_for_write = db_for_read
+
+    def allow_relation(self, obj1, obj2, **hints):
+        if obj1._meta.app_label == "taskapp" and obj2._meta.app_label == "taskapp":
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Shards get the full schema so migrations stay linear; only the
+        # sharded tables are ever written to there.
+        return None
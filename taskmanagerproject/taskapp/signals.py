@@ -1,24 +1,33 @@
 from datetime import timedelta
-from django.db.models.signals import pre_save, pre_delete, post_save
+from django.db.models.signals import m2m_changed, post_migrate, pre_save, pre_delete, post_save
 from django.dispatch import receiver
 from django.forms.models import model_to_dict
 from django.utils import timezone
-from .models import Task, Notification, TaskHistory
+from .models import User, Task, Notification, TaskHistory, STATUS_DONE
+from . import sharding
+from . import history
+from .cache import bump_user_version
 
 TASK_HISTORY_TRACK_FIELDS = ["title", "description", "priority", "status", "due_date", "completed_at"]
 
 def _subset_task_dict(task: "Task"):
     data = model_to_dict(task, fields=TASK_HISTORY_TRACK_FIELDS)
+    data.update(priority=task.priority_name, status=task.status_name)
     for k, v in data.items():
         if hasattr(v, "isoformat"):
             data[k] = v.isoformat()
     return data
 
+def task_soft_deleted_history(instance: Task, using):
+    state = _subset_task_dict(instance)
+    history.record(instance, "deleted", state, state, using)
+    Notification.objects.using(using).create(user_id=instance.user_id, task=instance, message=f"Task '{instance.title}' was deleted.")
+
 @receiver(pre_save, sender=Task)
-def task_pre_save(sender, instance: Task, **kwargs):
-    if instance.pk:
+def task_pre_save(sender, instance: Task, raw=False, using=None, update_fields=None, **kwargs):
+    if instance.pk and not raw and not (update_fields and "deleted_at" in update_fields):
         try:
-            prev = Task.objects.get(pk=instance.pk)
+            prev = Task.objects.using(using).get(pk=instance.pk)
             instance._previous_state = _subset_task_dict(prev)
         except Task.DoesNotExist:
             instance._previous_state = None
@@ -26,18 +35,24 @@ def task_pre_save(sender, instance: Task, **kwargs):
         instance._previous_state = None
 
 @receiver(post_save, sender=Task)
-def task_post_save_history_and_notifications(sender, instance: Task, created, **kwargs):
-    user = instance.user
+def task_post_save_history_and_notifications(sender, instance: Task, created, raw=False, using=None, update_fields=None, **kwargs):
+    if raw:
+        return
+    user_id = instance.user_id
+    bump_user_version(user_id)
+    if update_fields and "deleted_at" in update_fields and instance.deleted_at is not None:
+        task_soft_deleted_history(instance, using)
+        return
     new_state = _subset_task_dict(instance)
     old_state = getattr(instance, "_previous_state", None)
     changes = {}
 
     if created:
-        TaskHistory.objects.create(user=user, task=instance, action="created", changes=new_state)
-        Notification.objects.create(user=user, task=instance, message=f"Task '{instance.title}' was created.")
+        TaskHistory.objects.using(using).create(user_id=user_id, task=instance, action="created", changes=new_state, version=1, snapshot=new_state)
+        Notification.objects.using(using).create(user_id=user_id, task=instance, message=f"Task '{instance.title}' was created.")
         if instance.due_date and instance.due_date <= timezone.now() + timedelta(hours=24):
-            Notification.objects.create(
-                user=user, task=instance,
+            Notification.objects.using(using).create(
+                user_id=user_id, task=instance,
                 message=f"Task '{instance.title}' is due soon ({instance.due_date:%Y-%m-%d %H:%M})."
             )
         return
@@ -48,26 +63,45 @@ def task_post_save_history_and_notifications(sender, instance: Task, created, **
                 changes[f] = [old_state.get(f), new_state.get(f)]
 
     if changes:
-        TaskHistory.objects.create(user=user, task=instance, action="updated", changes=changes)
+        history.record(instance, "updated", changes, new_state, using)
         if "status" in changes:
             old_status, new_status = changes["status"]
-            Notification.objects.create(
-                user=user, task=instance,
+            Notification.objects.using(using).create(
+                user_id=user_id, task=instance,
                 message=f"Task '{instance.title}' status changed: {old_status} ➜ {new_status}."
             )
         if "due_date" in changes and instance.due_date:
-            Notification.objects.create(
-                user=user, task=instance,
+            Notification.objects.using(using).create(
+                user_id=user_id, task=instance,
                 message=f"Task '{instance.title}' due date updated to {instance.due_date:%Y-%m-%d %H:%M}."
             )
 
-    if instance.status == "done" and instance.completed_at is None:
+    if instance.status == STATUS_DONE and instance.completed_at is None:
     
-        Task.objects.filter(pk=instance.pk, completed_at__isnull=True).update(completed_at=timezone.now())
-        Notification.objects.create(user=user, task=instance, message=f"Task '{instance.title}' marked completed.")
+        Task.objects.using(using).filter(pk=instance.pk, completed_at__isnull=True).update(completed_at=timezone.now())
+        Notification.objects.using(using).create(user_id=user_id, task=instance, message=f"Task '{instance.title}' marked completed.")
+
+@receiver(m2m_changed, sender=Task.tags.through)
+def task_tags_changed(sender, instance, action, reverse=False, pk_set=None, using=None, **kwargs):
+    # Tags are part of the cached task lists. They are written after the
+    # task is saved, so a list cached in between holds the old tags.
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        bump_user_version(instance.user_id)
+    elif pk_set:
+        for user_id in set(Task.all_objects.using(using).filter(pk__in=pk_set).values_list("user_id", flat=True)):
+            bump_user_version(user_id)
 
-@receiver(pre_delete, sender=Task)
-def task_pre_delete_history(sender, instance: Task, **kwargs):
-    TaskHistory.objects.create(user=instance.user, task=instance, action="deleted", changes=_subset_task_dict(instance))
-    Notification.objects.create(user=instance.user, task=instance, message=f"Task '{instance.title}' was deleted.")
+@receiver(pre_delete, sender=User)
+def user_pre_delete_tombstone_tasks(sender, instance: User, using=None, **kwargs):
+    # Tasks, notifications and history are not cascaded synchronously: the
+    # user's tasks are tombstoned here and purge_deleted_tasks removes them.
+    alias = sharding.db_for_user(instance) or using
+    Task.objects.using(alias).filter(user_id=instance.pk).update(deleted_at=timezone.now())
+    bump_user_version(instance.pk)
 
+@receiver(post_migrate)
+def shard_id_sequences(sender, using=None, **kwargs):
+    if sender.name == "taskapp" and using in sharding.shards():
+        sharding.configure_id_sequences(using)
@@ -1,3 +1,791 @@
-from django.test import TestCase
+from datetime import datetime, timedelta, timezone as dt_timezone
+import gzip
+import json
+from io import BytesIO, StringIO
+from tempfile import TemporaryDirectory
+from unittest import mock, skipUnless
+from django.core.exceptions import MiddlewareNotUsed
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.conf import settings
+from django.http import JsonResponse
+from django.db import connection
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+from . import history, recurrence, sharding
+from .admin import EstimatedCountPaginator
+from .management.commands.bench_api_render import Command as BenchAPIRenderCommand
+from .management.commands.move_user_shard import Command as MoveUserShardCommand
+from .forms import TaskForm
+from .middleware import APICompressionMiddleware, RequestProfilingMiddleware, brotli
+from .parsers import FastJSONParser
+from .renderers import FastJSONRenderer
+from .profiling import list_profiles
+from .throttling import TokenBucketThrottle
+from .cache import task_list_cache, get_user_version, bump_user_version
+from .models import User, Task, Notification, TaskHistory, TaggedTask, ArchivedTaskHistory, ThrottleBucket, RECURRENCE_DAILY, RECURRENCE_WEEKLY, RECURRENCE_MONTHLY, PRIORITY_CHOICES, STATUS_IN_PROGRESS
 
-# Create your tests here.
+# Every budget is checked against each of these data set sizes (tasks per
+# user), so a query that runs once per row fails the test.
+TASK_COUNTS = (3, 30)
+PAGE_SIZES = (5, 50)
+
+LOCMEM_CACHES = {
+    alias: {"BACKEND": "django.core.cache.backends.locmem.LocMemCache", "LOCATION": alias}
+    for alias in ("default",)
+}
+
+STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+
+
+@override_settings(STORAGES=STORAGES)
+class QueryBudgetTestCase(APITestCase):
+    """Base class: seeded users and a helper asserting a fixed number of queries per request."""
+
+    def setUp(self):
+        # Throttle queries are counted by ThrottleTests, not every budget.
+        patcher = mock.patch.object(TokenBucketThrottle, "allow_request", return_value=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        task_list_cache.clear()
+        self.user = User.objects.create_user("alice", "alice@example.com", "s3cret-pass")
+        self.other = User.objects.create_user("bob", "bob@example.com", "s3cret-pass")
+        self.seed(self.other, 5)
+        self.client.force_authenticate(self.user)
+
+    def seed(self, user, count):
+        """Top ``user`` up to ``count`` tasks with tags, history, notifications and a few recurring rules."""
+        now = timezone.now()
+        for i in range(Task.objects.filter(user=user).count(), count):
+            task = Task.objects.create(
+                user=user,
+                title=f"Task {i}",
+                description="Seeded task",
+                priority=PRIORITY_CHOICES[i % 3][0],
+                due_date=now + timedelta(days=i % 10, hours=1),
+                recurrence=RECURRENCE_WEEKLY if i % 10 == 0 else "",
+            )
+            task.tags.add("work", f"tag{i % 4}")
+            task.status = STATUS_IN_PROGRESS
+            task.save()
+
+    def make_task(self):
+        task = Task.objects.create(user=self.user, title="Target", due_date=timezone.now() + timedelta(days=2))
+        task.tags.add("work")
+        return task
+
+    def assertQueryBudget(self, budget, request, prepare=None, sizes=TASK_COUNTS):
+        """Require exactly ``budget`` queries from ``request`` however many tasks the user has."""
+        for size in sizes:
+            self.seed(self.user, size)
+            args = (prepare(),) if prepare else ()
+            task_list_cache.clear()
+            with self.subTest(tasks=size), self.assertNumQueries(budget):
+                response = request(*args)
+            self.assertLess(response.status_code, 400, getattr(response, "data", response))
+
+
+class TaskReadQueryBudgetTests(QueryBudgetTestCase):
+    def test_list(self):
+        for page_size in PAGE_SIZES:
+            with mock.patch.object(PageNumberPagination, "page_size", page_size), self.subTest(page_size=page_size):
+                self.assertQueryBudget(4, lambda: self.client.get("/tasks/"))
+
+    def test_list_filtered_and_ordered(self):
+        self.assertQueryBudget(4, lambda: self.client.get("/tasks/", {"status": "in_progress", "ordering": "-priority", "tags": "work,tag1"}))
+
+    def test_list_with_recurring_occurrences(self):
+        today = timezone.now().date()
+        window = {"due_between_after": today.isoformat(), "due_between_before": (today + timedelta(days=60)).isoformat()}
+        self.assertQueryBudget(7, lambda: self.client.get("/tasks/", window))
+
+    def test_list_cache_hit(self):
+        self.seed(self.user, TASK_COUNTS[-1])
+        self.client.get("/tasks/")
+        with self.assertNumQueries(1):
+            response = self.client.get("/tasks/")
+        self.assertEqual(response["X-Cache"], "HIT")
+
+    def test_retrieve(self):
+        self.assertQueryBudget(2, lambda task: self.client.get(f"/tasks/{task.pk}/"), prepare=self.make_task)
+
+    def test_retrieve_as_of(self):
+        as_of = (timezone.now() + timedelta(hours=1)).isoformat()
+        self.assertQueryBudget(4, lambda task: self.client.get(f"/tasks/{task.pk}/", {"as_of": as_of}), prepare=self.make_task)
+
+    def test_agenda(self):
+        self.assertQueryBudget(7, lambda: self.client.get("/tasks/agenda/", {"day": timezone.now().date().isoformat()}))
+
+    def test_tag_facets(self):
+        self.assertQueryBudget(1, lambda: self.client.get("/tasks/tag_facets/"))
+
+
+class TaskWriteQueryBudgetTests(QueryBudgetTestCase):
+    def test_create(self):
+        due = (timezone.now() + timedelta(days=3)).isoformat()
+        self.assertQueryBudget(17, lambda: self.client.post(
+            "/tasks/", {"title": "New", "priority": "high", "due_date": due, "tags": ["work", "tag1"]}, format="json",
+        ))
+
+    def test_update_with_status_change(self):
+        self.assertQueryBudget(11, lambda task: self.client.patch(
+            f"/tasks/{task.pk}/", {"status": "in_progress", "title": "Renamed"}, format="json",
+        ), prepare=self.make_task)
+
+    def test_complete(self):
+        self.assertQueryBudget(10, lambda task: self.client.post(f"/tasks/{task.pk}/complete/"), prepare=self.make_task)
+
+    def test_delete(self):
+        self.assertQueryBudget(10, lambda task: self.client.delete(f"/tasks/{task.pk}/"), prepare=self.make_task)
+        self.assertFalse(Task.objects.filter(user=self.user, title="Target").exists())
+
+
+class HistoryAndNotificationQueryBudgetTests(QueryBudgetTestCase):
+    def test_history_list(self):
+        for page_size in PAGE_SIZES:
+            with mock.patch.object(PageNumberPagination, "page_size", page_size), self.subTest(page_size=page_size):
+                self.assertQueryBudget(2, lambda: self.client.get("/task-history/"))
+
+    def test_history_retrieve(self):
+        def prepare():
+            return TaskHistory.objects.filter(user=self.user).latest("created_at")
+        self.assertQueryBudget(1, lambda entry: self.client.get(f"/task-history/{entry.pk}/"), prepare=prepare)
+
+    def test_notification_list(self):
+        for page_size in PAGE_SIZES:
+            with mock.patch.object(PageNumberPagination, "page_size", page_size), self.subTest(page_size=page_size):
+                self.assertQueryBudget(2, lambda: self.client.get("/notifications/"))
+
+    def test_notification_mark_read(self):
+        def prepare():
+            return Notification.objects.filter(user=self.user, is_read=False).first()
+        self.assertQueryBudget(2, lambda n: self.client.patch(f"/notifications/{n.pk}/", {"is_read": True}, format="json"), prepare=prepare)
+
+    def test_mark_all_read(self):
+        self.assertQueryBudget(1, lambda: self.client.post("/notifications/mark_all_read/"))
+        self.assertFalse(Notification.objects.filter(user=self.user, is_read=False).exists())
+        self.assertTrue(Notification.objects.filter(user=self.other, is_read=False).exists())
+
+
+class DashboardQueryBudgetTests(QueryBudgetTestCase):
+    def test_dashboard(self):
+        self.client.force_login(self.user)
+        self.assertQueryBudget(4, lambda: self.client.get("/dashboard/"))
+
+
+@override_settings(CACHES=LOCMEM_CACHES, STORAGES=STORAGES)
+class TaskListCacheTests(APITestCase):
+    def setUp(self):
+        task_list_cache.clear()
+        self.user = User.objects.create_user("alice", "alice@example.com", "s3cret-pass")
+        self.client.force_authenticate(self.user)
+
+    def test_version_never_repeats(self):
+        seen = {get_user_version(self.user.pk)}
+        for _ in range(3):
+            bump_user_version(self.user.pk)
+            seen.add(get_user_version(self.user.pk))
+        self.assertEqual(len(seen), 4)
+        with self.assertNumQueries(1):
+            bump_user_version(self.user.pk)
+
+    def test_write_invalidates_cached_list(self):
+        Task.objects.create(user=self.user, title="First")
+        self.assertEqual(self.client.get("/tasks/")["X-Cache"], "MISS")
+        self.assertEqual(self.client.get("/tasks/")["X-Cache"], "HIT")
+        Task.objects.create(user=self.user, title="Second")
+        response = self.client.get("/tasks/")
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.data["count"], 2)
+
+    def test_cached_payload_is_detached_from_serializer(self):
+        Task.objects.create(user=self.user, title="First")
+        self.client.get("/tasks/")
+        (entry,) = task_list_cache._entries.values()
+        payload = entry[1]
+        self.assertIs(type(payload), dict)
+        self.assertIs(type(payload["results"]), list)
+        self.assertIs(type(payload["results"][0]), dict)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, STORAGES=STORAGES)
+class TaskTagTests(APITestCase):
+    def setUp(self):
+        task_list_cache.clear()
+        self.user = User.objects.create_user("alice", "alice@example.com", "s3cret-pass")
+
+    def test_html_form_saves_tags(self):
+        self.client.force_login(self.user)
+        response = self.client.post("/tasks/new/", {"title": "Tagged", "priority": "high", "tags": "foo, bar"})
+        self.assertEqual(response.status_code, 302)
+        task = Task.objects.get(user=self.user, title="Tagged")
+        self.assertEqual(sorted(task.tags.names()), ["bar", "foo"])
+
+    def test_tag_change_invalidates_cached_list(self):
+        self.client.force_authenticate(self.user)
+        task = Task.objects.create(user=self.user, title="Tagged")
+        self.assertEqual(self.client.get("/tasks/")["X-Cache"], "MISS")
+        task.tags.add("new")
+        response = self.client.get("/tasks/")
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.data["results"][0]["tags"], ["new"])
+        task.tags.clear()
+        self.assertEqual(self.client.get("/tasks/").data["results"][0]["tags"], [])
+
+    def test_bench_renders_without_database(self):
+        with self.assertNumQueries(0):
+            call_command("bench_api_render", rows=5, repeat=1, stdout=StringIO())
+
+
+@override_settings(CACHES=LOCMEM_CACHES, STORAGES=STORAGES)
+class SoftDeleteTests(APITestCase):
+    def setUp(self):
+        task_list_cache.clear()
+        self.user = User.objects.create_user("alice", "alice@example.com", "s3cret-pass")
+        self.client.force_authenticate(self.user)
+        self.task = Task.objects.create(
+            user=self.user, title="Daily", due_date=timezone.now() - timedelta(days=5), recurrence=RECURRENCE_DAILY,
+        )
+        self.before_delete = timezone.now()
+
+    def delete(self):
+        response = self.client.post(f"/tasks/{self.task.pk}/occurrence/", {
+            "occurrence_date": (self.task.due_date + timedelta(days=1)).isoformat(), "title": "Moved",
+        }, format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.delete(f"/tasks/{self.task.pk}/").status_code, 204)
+
+    def test_delete_tombstones_task_and_occurrences(self):
+        self.delete()
+        self.assertEqual(self.client.get(f"/tasks/{self.task.pk}/").status_code, 404)
+        self.assertEqual(self.client.get("/tasks/").data["count"], 0)
+        rows = Task.all_objects.filter(user=self.user)
+        self.assertEqual(rows.count(), 2)
+        self.assertFalse(rows.filter(deleted_at__isnull=True).exists())
+        self.assertTrue(TaskHistory.objects.filter(task=self.task, action="deleted").exists())
+
+    def test_as_of_before_delete_still_reads_task(self):
+        self.delete()
+        response = self.client.get(f"/tasks/{self.task.pk}/", {"as_of": self.before_delete.isoformat()})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["title"], "Daily")
+        response = self.client.get("/tasks/", {"as_of": self.before_delete.isoformat()})
+        self.assertEqual([t["id"] for t in response.data["results"]], [self.task.pk])
+
+    def test_user_delete_tombstones_tasks(self):
+        self.user.delete()
+        self.assertFalse(Task.objects.filter(pk=self.task.pk).exists())
+        self.assertIsNotNone(Task.all_objects.get(pk=self.task.pk).deleted_at)
+
+    def test_purge_archives_history_and_removes_rows(self):
+        self.delete()
+        call_command("purge_deleted_tasks", stdout=StringIO())
+        self.assertTrue(Task.all_objects.filter(pk=self.task.pk).exists())
+
+        history = TaskHistory.objects.filter(task__user=self.user).count()
+        call_command("purge_deleted_tasks", older_than_hours=0, batch_size=1, stdout=StringIO())
+        self.assertFalse(Task.all_objects.filter(user=self.user).exists())
+        self.assertFalse(Notification.objects.filter(user=self.user).exists())
+        self.assertEqual(ArchivedTaskHistory.objects.filter(user_id=self.user.pk).count(), history)
+
+    def test_purge_keeps_deleted_occurrences_of_live_rules(self):
+        when = self.task.due_date + timedelta(days=1)
+        response = self.client.post(f"/tasks/{self.task.pk}/occurrence/", {"occurrence_date": when.isoformat()}, format="json")
+        self.assertEqual(self.client.delete(f"/tasks/{response.data['id']}/").status_code, 204)
+        window = {"due_between_after": when.isoformat(), "due_between_before": (when + timedelta(days=2)).isoformat()}
+        self.assertEqual(self.client.get("/tasks/", window).data["count"], 2)
+
+        call_command("purge_deleted_tasks", older_than_hours=0, stdout=StringIO())
+        task_list_cache.clear()
+        self.assertEqual(self.client.get("/tasks/", window).data["count"], 2)
+        self.assertTrue(Task.all_objects.filter(pk=response.data["id"]).exists())
+
+    def test_purge_archives_history_in_row_batches(self):
+        for i in range(5):
+            self.task.title = f"Daily {i}"
+            self.task.save()
+        history = TaskHistory.objects.filter(task=self.task).count()
+        self.task.soft_delete()
+        call_command("purge_deleted_tasks", older_than_hours=0, batch_size=2, stdout=StringIO())
+        self.assertFalse(TaskHistory.objects.filter(task_id=self.task.pk).exists())
+        self.assertEqual(ArchivedTaskHistory.objects.filter(task_id=self.task.pk).count(), history + 1)
+
+    def test_purge_removes_notifications_of_deleted_users(self):
+        Notification.objects.create(user=self.user, message="Welcome")
+        self.user.delete()
+        call_command("purge_deleted_tasks", older_than_hours=0, stdout=StringIO())
+        self.assertFalse(Notification.objects.filter(user_id=self.user.pk).exists())
+
+
+class EstimatedCountPaginatorTests(APITestCase):
+    def test_estimate_ignores_default_tombstone_filter(self):
+        with mock.patch("taskapp.admin.estimate_table_rows", return_value=250_000):
+            self.assertEqual(EstimatedCountPaginator(Task.objects.all(), 50).count, 250_000)
+            self.assertEqual(EstimatedCountPaginator(Task.objects.filter(title="x"), 50).count, 0)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, STORAGES=STORAGES)
+class AdminTests(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser("root", "root@example.com", "s3cret-pass")
+        self.client.force_login(self.admin)
+        self.task = Task.objects.create(user=self.admin, title="Quarterly report")
+        Notification.objects.create(user=self.admin, task=self.task, message="Due soon")
+
+    def test_changelists_avoid_distinct_date_scans(self):
+        for model in ("task", "notification", "taskhistory", "archivedtaskhistory"):
+            with self.subTest(model=model), CaptureQueriesContext(connection) as queries:
+                response = self.client.get(f"/admin/taskapp/{model}/")
+            self.assertEqual(response.status_code, 200)
+            self.assertFalse([q["sql"] for q in queries if "DISTINCT" in q["sql"]])
+
+    def test_created_year_filter(self):
+        year = timezone.localtime(self.task.created_at).year
+        response = self.client.get("/admin/taskapp/task/", {"created_year": year})
+        self.assertEqual(list(response.context["cl"].result_list), [self.task])
+        response = self.client.get("/admin/taskapp/task/", {"created_year": year - 1})
+        self.assertEqual(list(response.context["cl"].result_list), [])
+
+    def test_task_autocomplete_uses_id_or_exact_title(self):
+        def search(term):
+            response = self.client.get("/admin/autocomplete/", {
+                "app_label": "taskapp", "model_name": "notification", "field_name": "task", "term": term,
+            })
+            return [int(r["id"]) for r in response.json()["results"]]
+
+        self.assertEqual(search(str(self.task.pk)), [self.task.pk])
+        self.assertEqual(search("Quarterly report"), [self.task.pk])
+        self.assertEqual(search("Quarterly"), [])
+
+
+SHARDS = ["shard_0", "shard_1"]
+HAS_SHARDS = set(SHARDS) <= set(settings.DATABASES)
+
+
+@skipUnless(HAS_SHARDS, "needs the shard aliases of taskmanagerproject.test_settings")
+@override_settings(CACHES=LOCMEM_CACHES, TASK_SHARDS=SHARDS, DATABASE_ROUTERS=["taskapp.sharding.UserShardRouter"])
+class ShardingTests(APITestCase):
+    databases = {"default", *SHARDS} if HAS_SHARDS else {"default"}
+
+    def setUp(self):
+        self.user = User.objects.create_user("alice", "alice@example.com", "s3cret-pass")
+        self.home = sharding.db_for_user(self.user)
+        self.away = next(alias for alias in SHARDS if alias != self.home)
+        self.task = Task.objects.create(user=self.user, title="Sharded", due_date=timezone.now() + timedelta(days=3))
+        self.task.tags.add("work")
+        self.task.status = STATUS_IN_PROGRESS
+        self.task.save()
+
+    def rows(self, alias):
+        return {
+            model.__name__: manager.using(alias).filter(user_id=self.user.pk).count()
+            for model, manager in [(Task, Task.all_objects), (TaskHistory, TaskHistory.objects), (Notification, Notification.objects)]
+        }
+
+    def test_router_keeps_user_rows_on_one_shard(self):
+        self.assertEqual(self.task._state.db, self.home)
+        self.assertEqual(self.rows(self.home), {"Task": 1, "TaskHistory": 2, "Notification": 2})
+        self.assertEqual(self.rows(self.away), {"Task": 0, "TaskHistory": 0, "Notification": 0})
+        self.assertEqual(list(Task.objects.for_user(self.user)), [self.task])
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get(f"/tasks/{self.task.pk}/").data["tags"], ["work"])
+
+    def test_move_user_shard(self):
+        before = self.rows(self.home)
+        call_command("move_user_shard", str(self.user.pk), self.away, stdout=StringIO())
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.shard, self.away)
+        self.assertEqual(self.rows(self.away), before)
+        self.assertEqual(self.rows(self.home), {"Task": 0, "TaskHistory": 0, "Notification": 0})
+        moved = Task.objects.for_user(self.user).get()
+        self.assertEqual(list(moved.tags.names()), ["work"])
+
+    def test_move_keeps_ids(self):
+        history_ids = set(TaskHistory.objects.using(self.home).filter(user_id=self.user.pk).values_list("pk", flat=True))
+        call_command("move_user_shard", str(self.user.pk), self.away, stdout=StringIO())
+        self.user.refresh_from_db()
+        self.client.force_authenticate(self.user)
+        self.assertEqual(self.client.get(f"/tasks/{self.task.pk}/").status_code, 200)
+        self.assertEqual(set(TaskHistory.objects.using(self.away).filter(user_id=self.user.pk).values_list("pk", flat=True)), history_ids)
+
+    def test_shard_id_residues(self):
+        self.assertEqual([sharding.id_offset(alias) for alias in SHARDS], [1, 2])
+        self.assertIsNone(sharding.id_offset("default"))
+        self.assertEqual(sharding.next_id_at_or_after("shard_1", 1), 2)
+        self.assertEqual(sharding.next_id_at_or_after("shard_1", 3), 2 + sharding.SHARD_ID_STRIDE)
+        self.assertEqual(sharding.next_id_at_or_after("shard_0", 1 + sharding.SHARD_ID_STRIDE), 1 + sharding.SHARD_ID_STRIDE)
+
+    def test_move_aborts_when_id_is_taken(self):
+        other = User.objects.create_user("bob", "bob@example.com", "s3cret-pass", shard=self.away)
+        Task(pk=self.task.pk, user=other, title="Clash", created_at=timezone.now()).save_base(raw=True, force_insert=True, using=self.away)
+        before = self.rows(self.home)
+        with self.assertRaisesMessage(CommandError, "already taken"):
+            call_command("move_user_shard", str(self.user.pk), self.away, stdout=StringIO())
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.shard, "")
+        self.assertEqual(self.rows(self.home), before)
+        self.assertEqual(self.rows(self.away), {"Task": 0, "TaskHistory": 0, "Notification": 0})
+
+    def test_move_aborts_when_source_changes_during_copy(self):
+        copy = MoveUserShardCommand._copy
+        def copy_and_write(command, obj, target, **overrides):
+            # Runs while the last model (tag links) is copied.
+            if isinstance(obj, TaggedTask) and not Notification.objects.using(self.home).filter(message="Late").exists():
+                Notification.objects.using(self.home).create(user=self.user, message="Late")
+            return copy(command, obj, target, **overrides)
+
+        before = self.rows(self.home)
+        with mock.patch.object(MoveUserShardCommand, "_copy", copy_and_write), self.assertRaises(CommandError):
+            call_command("move_user_shard", str(self.user.pk), self.away, stdout=StringIO())
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.shard, "")
+        self.assertEqual(self.rows(self.away), {"Task": 0, "TaskHistory": 0, "Notification": 0})
+        self.assertEqual(self.rows(self.home), {**before, "Notification": before["Notification"] + 1})
+
+
+@override_settings(CACHES=LOCMEM_CACHES, TASK_HISTORY_SNAPSHOT_EVERY=3)
+class TaskHistoryTests(APITestCase):
+    def setUp(self):
+        task_list_cache.clear()
+        self.user = User.objects.create_user("alice", "alice@example.com", "s3cret-pass")
+        self.client.force_authenticate(self.user)
+        self.task = Task.objects.create(user=self.user, title="v1")
+        self.checkpoints = [(timezone.now(), "v1")]
+        for n in range(2, 9):
+            self.task.title = f"v{n}"
+            self.task.save()
+            self.checkpoints.append((timezone.now(), f"v{n}"))
+
+    def test_versions_and_snapshots(self):
+        entries = list(TaskHistory.objects.filter(task=self.task).order_by("version").values_list("version", "snapshot"))
+        self.assertEqual([v for v, _ in entries], list(range(1, 9)))
+        self.assertEqual([v for v, snapshot in entries if snapshot], [1, 3, 6])
+
+    def test_as_of_replays_from_latest_snapshot(self):
+        for when, title in self.checkpoints:
+            with self.subTest(title=title):
+                self.assertEqual(history.task_as_of(self.task, when).title, title)
+                self.assertEqual(self.client.get(f"/tasks/{self.task.pk}/", {"as_of": when.isoformat()}).data["title"], title)
+        before = TaskHistory.objects.get(task=self.task, version=1).created_at - timedelta(seconds=1)
+        self.assertIsNone(history.task_as_of(self.task, before))
+
+    def test_as_of_list_rejects_filters_and_ordering(self):
+        when = self.checkpoints[2][0].isoformat()
+        self.assertEqual(self.client.get("/tasks/", {"as_of": when})["X-Cache"], "MISS")
+        for extra in ({"status": "todo"}, {"ordering": "title"}, {"search": "v"}):
+            with self.subTest(**extra):
+                self.assertEqual(self.client.get("/tasks/", {"as_of": when, **extra}).status_code, 400)
+
+    def test_concurrent_version_is_retried(self):
+        taken = history.next_version(self.task)
+        with mock.patch.object(history, "next_version", side_effect=[taken - 1, taken]):
+            entry = history.record(self.task, "updated", {"title": ["v8", "v8"]}, {}, "default")
+        self.assertEqual(entry.version, taken)
+
+
+@override_settings(
+    CACHES=LOCMEM_CACHES, STORAGES=STORAGES,
+    REST_FRAMEWORK={**settings.REST_FRAMEWORK, "DEFAULT_THROTTLE_RATES": {
+        **settings.REST_FRAMEWORK["DEFAULT_THROTTLE_RATES"], "tasks": "2/min", "anon": "1/min",
+    }},
+)
+class ThrottleTests(APITestCase):
+    def setUp(self):
+        self.now = 1_000_000.0
+        patcher = mock.patch.object(TokenBucketThrottle, "timer", mock.Mock(side_effect=lambda: self.now))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user("alice", "alice@example.com", "s3cret-pass")
+        self.client.force_authenticate(self.user)
+
+    def test_empty_bucket_sends_retry_after(self):
+        self.assertEqual(self.client.get("/tasks/").status_code, 200)
+        self.assertEqual(self.client.get("/tasks/").status_code, 200)
+        self.now += 10
+        response = self.client.get("/tasks/")
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response["Retry-After"], "20")
+
+    def test_bucket_refills_over_time(self):
+        for _ in range(2):
+            self.client.get("/tasks/")
+        self.assertEqual(self.client.get("/tasks/").status_code, 429)
+        self.now += 30
+        self.assertEqual(self.client.get("/tasks/").status_code, 200)
+        self.assertEqual(self.client.get("/tasks/").status_code, 429)
+        self.now += 600
+        for _ in range(2):
+            self.assertEqual(self.client.get("/tasks/").status_code, 200)
+        self.assertEqual(self.client.get("/tasks/").status_code, 429)
+
+    def test_token_costs_one_update_per_scope(self):
+        self.client.get("/tasks/")
+        with self.assertNumQueries(2):
+            self.assertTrue(self.throttle("tasks").allow_request(mock.Mock(user=self.user), None))
+            self.assertTrue(self.throttle("user").allow_request(mock.Mock(user=self.user), None))
+        self.assertEqual(ThrottleBucket.objects.count(), 2)
+
+    def test_forwarded_for_is_ignored_without_proxies(self):
+        self.client.force_authenticate(None)
+        credentials = {"username": "alice", "password": "wrong"}
+        self.assertEqual(self.client.post("/auth/login/", credentials, HTTP_X_FORWARDED_FOR="10.0.0.1").status_code, 401)
+        self.assertEqual(self.client.post("/auth/login/", credentials, HTTP_X_FORWARDED_FOR="10.0.0.2").status_code, 429)
+
+    def test_idle_buckets_are_removed(self):
+        self.client.get("/tasks/")
+        self.now += 2 * 86400
+        bob = User.objects.create_user("bob", "bob@example.com", "s3cret-pass")
+        self.client.force_authenticate(bob)
+        self.client.get("/tasks/")
+        self.assertEqual(set(ThrottleBucket.objects.values_list("key", flat=True)), {f"tasks:u{bob.pk}", f"user:u{bob.pk}"})
+
+    def throttle(self, scope):
+        throttle = TokenBucketThrottle()
+        throttle.scope = scope
+        return throttle
+
+
+@override_settings(CACHES=LOCMEM_CACHES, STORAGES=STORAGES)
+class AgendaTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("alice", "alice@example.com", "s3cret-pass")
+        self.client.force_authenticate(self.user)
+
+    def agenda(self, **params):
+        response = self.client.get("/tasks/agenda/", params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return {b["date"]: b["total"] for b in response.data["buckets"]}
+
+    def test_buckets_by_local_day(self):
+        Task.objects.create(user=self.user, title="Late", due_date=datetime(2026, 3, 10, 2, 30, tzinfo=dt_timezone.utc))
+        self.assertEqual(self.agenda(start="2026-03-01", end="2026-03-31", tz="America/New_York"), {"2026-03-09": 1})
+        self.assertEqual(self.agenda(start="2026-03-01", end="2026-03-31"), {"2026-03-10": 1})
+
+    def test_buckets_by_week(self):
+        for day in (9, 15, 16):
+            Task.objects.create(user=self.user, title=f"Day {day}", due_date=datetime(2026, 3, day, 12, tzinfo=dt_timezone.utc))
+        Task.objects.create(
+            user=self.user, title="Weekly", recurrence=RECURRENCE_WEEKLY,
+            due_date=datetime(2026, 2, 25, 12, tzinfo=dt_timezone.utc),
+        )
+        self.assertEqual(
+            self.agenda(start="2026-03-01", end="2026-03-22", bucket="week"),
+            {"2026-03-02": 1, "2026-03-09": 3, "2026-03-16": 2},
+        )
+
+    def test_occurrences_are_not_capped(self):
+        for i in range(4):
+            Task.objects.create(
+                user=self.user, title=f"Daily {i}", recurrence=RECURRENCE_DAILY,
+                due_date=datetime(2025, 12, 31, 12, tzinfo=dt_timezone.utc),
+            )
+        buckets = self.agenda(start="2026-01-01", end="2026-12-31", bucket="week")
+        self.assertEqual(sum(buckets.values()), 4 * 365)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, STORAGES=STORAGES, REQUEST_PROFILING=True, REQUEST_PROFILING_SAMPLE_RATE=0)
+class RequestProfilingTests(APITestCase):
+    def setUp(self):
+        directory = TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        profile_settings = self.settings(REQUEST_PROFILING_DIR=directory.name)
+        profile_settings.enable()
+        self.addCleanup(profile_settings.disable)
+        self.staff = User.objects.create_user("root", "root@example.com", "s3cret-pass", is_staff=True)
+        self.user = User.objects.create_user("alice", "alice@example.com", "s3cret-pass")
+
+    def bearer(self, user):
+        return {"HTTP_AUTHORIZATION": f"Bearer {RefreshToken.for_user(user).access_token}"}
+
+    def test_staff_session_is_profiled(self):
+        self.client.force_login(self.staff)
+        response = self.client.get("/dashboard/", HTTP_X_PROFILE="1")
+        self.assertIn(response["X-Profile-Id"], [p["id"] for p in list_profiles()])
+
+    def test_staff_jwt_is_profiled(self):
+        response = self.client.get("/tasks/", {"_profile": "1"}, **self.bearer(self.staff))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([p["id"] for p in list_profiles()], [response["X-Profile-Id"]])
+
+    def test_other_users_are_not_profiled(self):
+        self.client.force_login(self.user)
+        self.assertFalse(self.client.get("/dashboard/", HTTP_X_PROFILE="1").has_header("X-Profile-Id"))
+        self.client.logout()
+        self.assertFalse(self.client.get("/tasks/", HTTP_X_PROFILE="1", **self.bearer(self.user)).has_header("X-Profile-Id"))
+        self.assertFalse(self.client.get("/tasks/", HTTP_X_PROFILE="1", HTTP_AUTHORIZATION="Bearer junk").has_header("X-Profile-Id"))
+        self.assertEqual(list_profiles(), [])
+
+    def test_overlapping_profile_is_served_unprofiled(self):
+        # What cProfile raises on Python 3.12+ while another profiler is active.
+        error = ValueError("Another profiling tool is already active")
+        with mock.patch("cProfile.Profile.enable", side_effect=error):
+            response = self.client.get("/tasks/", HTTP_X_PROFILE="1", **self.bearer(self.staff))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header("X-Profile-Id"))
+        self.assertEqual(list_profiles(), [])
+
+    @override_settings(REQUEST_PROFILING_KEEP=2)
+    def test_rotation_keeps_newest(self):
+        ids = [self.client.get("/tasks/", HTTP_X_PROFILE="1", **self.bearer(self.staff))["X-Profile-Id"] for _ in range(4)]
+        self.assertEqual([p["id"] for p in list_profiles()], ids[:1:-1])
+
+    @override_settings(REQUEST_PROFILING=False)
+    def test_not_installed_when_disabled(self):
+        with self.assertRaises(MiddlewareNotUsed):
+            RequestProfilingMiddleware(lambda request: None)
+
+
+@override_settings(CACHES=LOCMEM_CACHES, STORAGES=STORAGES)
+class RecurrenceTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user("alice", "alice@example.com", "s3cret-pass")
+        self.anchor = datetime(2026, 1, 31, 12, tzinfo=dt_timezone.utc)
+
+    def rule(self, recurrence_rule, **fields):
+        return Task(user=self.user, title="Rule", due_date=self.anchor, recurrence=recurrence_rule, **fields)
+
+    def test_first_index_at_or_after(self):
+        daily = self.rule(RECURRENCE_DAILY)
+        self.assertEqual(recurrence._first_index_at_or_after(daily, self.anchor - timedelta(days=3)), 0)
+        self.assertEqual(recurrence._first_index_at_or_after(daily, self.anchor + timedelta(days=4)), 4)
+        self.assertEqual(recurrence._first_index_at_or_after(daily, self.anchor + timedelta(days=4, minutes=1)), 5)
+        monthly = self.rule(RECURRENCE_MONTHLY)
+        self.assertEqual(recurrence._first_index_at_or_after(monthly, datetime(2026, 2, 28, 12, tzinfo=dt_timezone.utc)), 1)
+        self.assertEqual(recurrence._first_index_at_or_after(monthly, datetime(2026, 3, 1, tzinfo=dt_timezone.utc)), 2)
+
+    def test_monthly_clamps_to_month_end(self):
+        monthly = self.rule(RECURRENCE_MONTHLY)
+        self.assertEqual(
+            [recurrence.nth_occurrence(monthly, n).date().isoformat() for n in range(4)],
+            ["2026-01-31", "2026-02-28", "2026-03-31", "2026-04-30"],
+        )
+        monthly.due_date = datetime(2028, 1, 31, tzinfo=dt_timezone.utc)
+        self.assertEqual(recurrence.nth_occurrence(monthly, 1).date().isoformat(), "2028-02-29")
+
+    def test_recurrence_end_is_inclusive(self):
+        weekly = self.rule(RECURRENCE_WEEKLY, recurrence_end=self.anchor + timedelta(weeks=3))
+        dates = list(recurrence.occurrence_dates(weekly, self.anchor, self.anchor + timedelta(weeks=10)))
+        self.assertEqual(dates, [self.anchor + timedelta(weeks=n) for n in (1, 2, 3)])
+
+    def test_is_occurrence(self):
+        weekly = self.rule(RECURRENCE_WEEKLY, recurrence_end=self.anchor + timedelta(weeks=3))
+        self.assertTrue(recurrence.is_occurrence(weekly, self.anchor + timedelta(weeks=2)))
+        self.assertFalse(recurrence.is_occurrence(weekly, self.anchor))
+        self.assertFalse(recurrence.is_occurrence(weekly, self.anchor + timedelta(days=8)))
+        self.assertFalse(recurrence.is_occurrence(weekly, self.anchor + timedelta(weeks=4)))
+        self.assertFalse(recurrence.is_occurrence(self.rule(""), self.anchor + timedelta(weeks=1)))
+
+    def test_materialize_is_idempotent_and_copies_tags(self):
+        rule = self.rule(RECURRENCE_DAILY, priority=PRIORITY_CHOICES[2][0])
+        rule.save()
+        rule.tags.add("work")
+        when = self.anchor + timedelta(days=2)
+        occurrence = recurrence.materialize(rule, when)
+        self.assertEqual(recurrence.materialize(rule, when).pk, occurrence.pk)
+        self.assertEqual(Task.objects.filter(recurrence_parent=rule).count(), 1)
+        self.assertEqual((occurrence.due_date, occurrence.priority), (when, rule.priority))
+        self.assertEqual(list(occurrence.tags.names()), ["work"])
+
+    def test_materialized_dates_do_not_use_up_the_cap(self):
+        rule = self.rule(RECURRENCE_DAILY)
+        rule.save()
+        for days in (1, 2):
+            recurrence.materialize(rule, self.anchor + timedelta(days=days))
+        with mock.patch.object(recurrence, "MAX_EXPANDED_OCCURRENCES", 3):
+            occurrences = recurrence.expand([rule], self.anchor, self.anchor + timedelta(days=10))
+        self.assertEqual([o.due_date for o in occurrences], [self.anchor + timedelta(days=n) for n in (3, 4, 5)])
+
+    def test_window_list_pages_merge_rows_and_occurrences_by_due_date(self):
+        self.client.force_authenticate(self.user)
+        Task.objects.create(user=self.user, title="Rule", recurrence=RECURRENCE_DAILY, due_date=self.anchor, recurrence_end=self.anchor + timedelta(days=4))
+        for days in (1, 3, 5):
+            Task.objects.create(user=self.user, title=f"Task {days}", due_date=self.anchor + timedelta(days=days))
+        window = {"due_between_after": (self.anchor + timedelta(hours=1)).isoformat(), "due_between_before": (self.anchor + timedelta(days=6)).isoformat()}
+        titles = []
+        with mock.patch.object(PageNumberPagination, "page_size", 3):
+            for page in (1, 2, 3):
+                response = self.client.get("/tasks/", {**window, "page": page})
+                self.assertEqual(response.data["count"], 7)
+                titles += [(t["title"], t["due_date"][:10]) for t in response.data["results"]]
+        self.assertEqual(titles, [
+            ("Task 1", "2026-02-01"), ("Rule", "2026-02-01"), ("Rule", "2026-02-02"), ("Task 3", "2026-02-03"),
+            ("Rule", "2026-02-03"), ("Rule", "2026-02-04"), ("Task 5", "2026-02-05"),
+        ])
+        response = self.client.get("/tasks/", {**window, "ordering": "-due_date"})
+        self.assertEqual([t["title"] for t in response.data["results"]][:2], ["Task 5", "Rule"])
+
+    def test_form_rejects_end_before_due_date(self):
+        form = TaskForm(data={
+            "title": "Rule", "priority": "medium", "recurrence": RECURRENCE_DAILY,
+            "due_date": "2026-01-31 12:00", "recurrence_end": "2026-01-30 12:00",
+        })
+        self.assertFalse(form.is_valid())
+        self.assertIn("recurrence_end", form.errors)
+
+
+@override_settings(API_COMPRESSION_MIN_SIZE=1024)
+class APICompressionTests(SimpleTestCase):
+    body = {"results": [{"id": i, "title": f"Task {i}", "tags": ["work"]} for i in range(100)]}
+
+    def compress(self, accept, data=None, etag='"abc"'):
+        response = JsonResponse(self.body if data is None else data)
+        if etag:
+            response["ETag"] = etag
+        request = RequestFactory().get("/tasks/", HTTP_ACCEPT_ENCODING=accept)
+        return APICompressionMiddleware(lambda request: response)(request)
+
+    def test_small_responses_are_not_compressed(self):
+        response = self.compress("gzip, br", data={"id": 1})
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertEqual(response["Vary"], "Accept-Encoding")
+
+    def test_prefers_brotli_and_weakens_etag(self):
+        response = self.compress("gzip, br")
+        self.assertEqual(response["Content-Encoding"], "br")
+        self.assertEqual(response["Vary"], "Accept-Encoding")
+        self.assertEqual(response["ETag"], 'W/"abc"')
+        self.assertEqual(int(response["Content-Length"]), len(response.content))
+        self.assertEqual(json.loads(brotli.decompress(response.content)), self.body)
+
+    def test_brotli_beats_gzip_on_bench_payloads(self):
+        for name, (serializer_class, objects) in BenchAPIRenderCommand()._payloads(100).items():
+            data = {"results": serializer_class(objects, many=True).data}
+            with self.subTest(payload=name):
+                brotli_size = len(self.compress("br", data=data).content)
+                self.assertLess(brotli_size, len(self.compress("gzip", data=data).content))
+
+    def test_gzip_without_brotli(self):
+        with mock.patch("taskapp.middleware.brotli", None):
+            response = self.compress("gzip, br")
+        self.assertEqual(response["Content-Encoding"], "gzip")
+        self.assertEqual(json.loads(gzip.decompress(response.content)), self.body)
+
+    def test_zero_quality_is_refused(self):
+        self.assertEqual(self.compress("br;q=0, gzip;q=0.5")["Content-Encoding"], "gzip")
+        response = self.compress("br;q=0, gzip;q=0.0", etag=None)
+        self.assertFalse(response.has_header("Content-Encoding"))
+        self.assertEqual(json.loads(response.content), self.body)
+
+
+class FastJSONTests(SimpleTestCase):
+    data = {"title": "Fix   bug ✓", "due": timezone.now(), "tags": ["work"], "count": None}
+
+    def test_stdlib_fallback_matches_orjson(self):
+        fast = FastJSONRenderer().render(self.data)
+        with mock.patch("taskapp.renderers.orjson", None):
+            self.assertEqual(FastJSONRenderer().render(self.data), fast)
+        self.assertEqual(fast, JSONRenderer().render(self.data))
+
+    def test_parser_fallback(self):
+        body = FastJSONRenderer().render(self.data)
+        parsed = FastJSONParser().parse(BytesIO(body))
+        with mock.patch("taskapp.parsers.orjson", None):
+            self.assertEqual(FastJSONParser().parse(BytesIO(body)), parsed)
@@ -0,0 +1,89 @@
+import time
+from django.core.exceptions import ImproperlyConfigured
+from django.db import IntegrityError, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Least
+from rest_framework.settings import api_settings
+from rest_framework.throttling import BaseThrottle
+from .models import ThrottleBucket
+
+PERIODS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Token bucket throttle. A rate of ``"N/period"`` refills N tokens per period
+    and allows bursts of up to N requests. Buckets are ThrottleBucket rows,
+    taken with a single conditional UPDATE so concurrent workers never spend
+    the same token; rows idle for a day are full again and get removed.
+    """
+
+    scope = None
+    timer = time.time
+
+    def get_scope(self, request, view):
+        return self.scope
+
+    def get_ident_key(self, request):
+        if request.user and request.user.is_authenticated:
+            return f"u{request.user.pk}"
+        return f"ip{self.get_ident(request)}"
+
+    def parse_rate(self, rate):
+        num, period = rate.split("/")
+        try:
+            return int(num), PERIODS[period[0]]
+        except (KeyError, IndexError, ValueError):
+            raise ImproperlyConfigured(f"Invalid throttle rate {rate!r}")
+
+    def allow_request(self, request, view):
+        self.wait_seconds = None
+        scope = self.get_scope(request, view)
+        rate = api_settings.DEFAULT_THROTTLE_RATES.get(scope) if scope else None
+        if rate is None:
+            return True
+
+        capacity, period = self.parse_rate(rate)
+        refill = capacity / period
+        key = f"{scope}:{self.get_ident_key(request)}"
+        now = self.timer()
+        buckets = ThrottleBucket.objects.filter(key=key)
+        tokens = Least(Value(float(capacity)), F("tokens") + (Value(now) - F("stamp")) * Value(refill))
+        if buckets.alias(available=tokens).filter(available__gte=1).update(tokens=tokens - 1, stamp=now):
+            return True
+
+        bucket = buckets.values_list("tokens", "stamp").first()
+        if bucket is None:
+            return self.create_bucket(key, capacity - 1, now) or self.allow_request(request, view)
+        available = min(capacity, bucket[0] + (now - bucket[1]) * refill)
+        self.wait_seconds = max(0, round((1 - available) / refill, 3))
+        return False
+
+    def create_bucket(self, key, tokens, now):
+        """Start a bucket for a new client; False if another request got there first."""
+        ThrottleBucket.objects.filter(stamp__lt=now - PERIODS["d"]).delete()
+        try:
+            with transaction.atomic():
+                ThrottleBucket.objects.create(key=key, tokens=tokens, stamp=now)
+        except IntegrityError:
+            return False
+        return True
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class UserTokenBucketThrottle(TokenBucketThrottle):
+    """Overall budget per user (``user`` rate) or per client IP (``anon`` rate)."""
+
+    def get_scope(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return "user"
+        return "anon"
+
+
+class ScopedTokenBucketThrottle(TokenBucketThrottle):
+    """Budget per user for views or actions that set ``throttle_scope``."""
+
+    def get_scope(self, request, view):
+        return getattr(view, "throttle_scope", self.scope)
@@ -1,40 +1,259 @@
+from collections import Counter
+from datetime import datetime, time, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+from django.db.models import Count, Q
+from django.db.models.functions import TruncDate, TruncWeek
 from django.utils import timezone
 from rest_framework import viewsets, mixins, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from rest_framework.generics import CreateAPIView
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.fields import DateField, DateTimeField
 from rest_framework.filters import SearchFilter, OrderingFilter
 from django_filters.rest_framework import DjangoFilterBackend
-from .models import Task, Notification, TaskHistory
+from rest_framework_simplejwt.views import TokenObtainPairView
+from .models import Task, Notification, TaskHistory, TaggedTask, PRIORITY_NAMES, STATUS_NAMES, STATUS_DONE, STATUS_TODO
 from .serializers import TaskSerializer, NotificationSerializer, RegisterSerializer, TaskHistorySerializer
 from .permissions import IsOwner
-from .filters import TaskFilter, NotificationFilter, TaskHistoryFilter
+from .filters import TaskFilter, TaskOrderingFilter, NotificationFilter, TaskHistoryFilter
+from . import recurrence
+from .history import tasks_as_of, task_as_of
+from .cache import task_list_cache, task_list_cache_key
+
+AGENDA_MAX_DAYS = 366
+# Filters, search and ordering work on current columns, so with as_of only
+# these are accepted (results are ordered by the immutable created_at).
+AS_OF_LIST_PARAMS = {"as_of", "page", "format"}
+
 
 class RegisterView(CreateAPIView):
     authentication_classes = []
     permission_classes = []
     serializer_class = RegisterSerializer
+    throttle_scope = "register"
+
+
+class LoginView(TokenObtainPairView):
+    throttle_scope = "login"
 
 
 class TaskViewSet(viewsets.ModelViewSet):
     serializer_class = TaskSerializer
     permission_classes = [IsAuthenticated, IsOwner]
-    filter_backends = [DjangoFilterBackend, SearchFilter, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, SearchFilter, TaskOrderingFilter]
     filterset_class = TaskFilter
     search_fields = ["title", "description"]
     ordering_fields = ["created_at", "due_date", "completed_at", "priority", "status"]
+    throttle_scope = "tasks"
 
     def get_queryset(self):
-        return Task.objects.filter(user=self.request.user)
+        if self.action == "retrieve":
+            as_of = self.get_as_of()
+            if as_of is not None:
+                return self.get_as_of_queryset(as_of)
+        return Task.objects.for_user(self.request.user).prefetch_related("tags")
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
+    def perform_destroy(self, instance):
+        instance.soft_delete()
+
+    def get_as_of(self):
+        raw = self.request.query_params.get("as_of")
+        if not raw:
+            return None
+        try:
+            return DateTimeField().to_internal_value(raw)
+        except ValidationError as exc:
+            raise ValidationError({"as_of": exc.detail})
+
+    def get_as_of_queryset(self, as_of):
+        """Tasks that existed at ``as_of``, including ones soft-deleted since."""
+        return (
+            Task.all_objects.for_user(self.request.user).prefetch_related("tags")
+            .filter(Q(deleted_at__isnull=True) | Q(deleted_at__gt=as_of), created_at__lte=as_of)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        as_of = self.get_as_of()
+        if as_of is None:
+            return super().retrieve(request, *args, **kwargs)
+        task = task_as_of(self.get_object(), as_of)
+        if task is None:
+            raise NotFound("Task did not exist at that time.")
+        return Response(self.get_serializer(task).data)
+
+    def list(self, request, *args, **kwargs):
+        key, ttl = task_list_cache_key(request)
+        data = task_list_cache.get(key)
+        if data is not None:
+            return Response(data, headers={"X-Cache": "HIT"})
+        response = self.list_uncached(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            task_list_cache.set(key, response.data, ttl)
+        response["X-Cache"] = "MISS"
+        return response
+
+    def list_uncached(self, request, *args, **kwargs):
+        as_of = self.get_as_of()
+        if as_of is not None:
+            unsupported = sorted(set(request.query_params) - AS_OF_LIST_PARAMS)
+            if unsupported:
+                raise ValidationError({"as_of": f"Cannot be combined with: {', '.join(unsupported)}."})
+            queryset = self.get_as_of_queryset(as_of).order_by("-created_at", "-pk")
+            page = self.paginate_queryset(queryset)
+            if page is not None:
+                return self.get_paginated_response(self.get_serializer(tasks_as_of(page, as_of), many=True).data)
+            return Response(self.get_serializer(tasks_as_of(queryset, as_of), many=True).data)
+
+        filterset = self.filterset_class(request.query_params, queryset=self.get_queryset(), request=request)
+        if filterset.due_window() is None:
+            return super().list(request, *args, **kwargs)
+
+        rules = self.get_queryset().filter(recurrence_parent__isnull=True).exclude(recurrence="")
+        rules = SearchFilter().filter_queryset(request, rules, self)
+        occurrences = filterset.expand_occurrences(rules)
+        if not occurrences:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        ordering = TaskOrderingFilter().get_ordering(request, queryset, self) or Task._meta.ordering
+        rows = recurrence.TasksWithOccurrences(queryset, occurrences, ordering)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response(self.get_serializer(page, many=True).data)
+        return Response(self.get_serializer(rows[:], many=True).data)
+
+    def get_occurrence(self, rule):
+        """Materialize the occurrence of ``rule`` named by ``occurrence_date`` in the request body."""
+        try:
+            when = DateTimeField().to_internal_value(self.request.data.get("occurrence_date"))
+        except ValidationError as exc:
+            raise ValidationError({"occurrence_date": exc.detail})
+        if not recurrence.is_occurrence(rule, when):
+            raise ValidationError({"occurrence_date": "Not an occurrence of this task."})
+        occurrence = recurrence.materialize(rule, when)
+        if occurrence.deleted_at is not None:
+            raise ValidationError({"occurrence_date": "This occurrence was deleted."})
+        return occurrence
+
+    @action(detail=False, methods=["get"])
+    def agenda(self, request):
+        """
+        Per-day (or per-week) task counts by status and priority for a date
+        range in the caller's time zone, plus the full rows for one ``day``.
+        Query params: start, end (inclusive dates), bucket=day|week, tz, day.
+        """
+        params = request.query_params
+        try:
+            tz = ZoneInfo(params.get("tz") or "UTC")
+        except (ZoneInfoNotFoundError, ValueError):
+            raise ValidationError({"tz": "Unknown time zone."})
+        bucket = params.get("bucket", "day")
+        if bucket not in ("day", "week"):
+            raise ValidationError({"bucket": "Must be 'day' or 'week'."})
+        start = self._agenda_date("start", timezone.localtime(timezone.now(), tz).date())
+        end = self._agenda_date("end", start + timedelta(days=30))
+        if end < start or (end - start).days > AGENDA_MAX_DAYS:
+            raise ValidationError({"end": f"Must be on or after start and at most {AGENDA_MAX_DAYS} days later."})
+        window = (
+            datetime.combine(start, time.min, tzinfo=tz),
+            datetime.combine(end + timedelta(days=1), time.min, tzinfo=tz),
+        )
+
+        def bucket_of(day):
+            return day - timedelta(days=day.weekday()) if bucket == "week" else day
+
+        queryset = self.filter_queryset(self.get_queryset()).order_by()
+        trunc = TruncWeek if bucket == "week" else TruncDate
+        rows = (
+            queryset.prefetch_related(None).filter(due_date__gte=window[0], due_date__lt=window[1])
+            .annotate(bucket=trunc("due_date", tzinfo=tz))
+            .values_list("bucket", "status", "priority")
+            .annotate(count=Count("id"))
+        )
+        counts = [(b.date() if isinstance(b, datetime) else b, s, p, n) for b, s, p, n in rows]
+
+        filterset = self.filterset_class(params, queryset=self.get_queryset(), request=request)
+        rules = self.get_queryset().filter(recurrence_parent__isnull=True).exclude(recurrence="")
+        # Pending occurrences are counted per rule without building Task
+        # objects, so long ranges are not cut off by MAX_EXPANDED_OCCURRENCES.
+        pending = Counter(
+            (bucket_of(when.astimezone(tz).date()), rule.priority)
+            for rule, when in filterset.pending_occurrence_dates(SearchFilter().filter_queryset(request, rules, self), window)
+            if when < window[1]
+        )
+        counts += [(day, STATUS_TODO, priority, count) for (day, priority), count in pending.items()]
+
+        buckets = {}
+        for day, task_status, priority, count in counts:
+            entry = buckets.setdefault(day, {"date": day.isoformat(), "total": 0, "by_status": {}, "by_priority": {}})
+            entry["total"] += count
+            task_status, priority = STATUS_NAMES[task_status], PRIORITY_NAMES[priority]
+            entry["by_status"][task_status] = entry["by_status"].get(task_status, 0) + count
+            entry["by_priority"][priority] = entry["by_priority"].get(priority, 0) + count
+        data = {
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "tz": str(tz),
+            "bucket": bucket,
+            "buckets": [buckets[day] for day in sorted(buckets)],
+        }
+
+        if params.get("day"):
+            day = self._agenda_date("day", start)
+            day_start = datetime.combine(day, time.min, tzinfo=tz)
+            day_end = day_start + timedelta(days=1)
+            tasks = list(queryset.filter(due_date__gte=day_start, due_date__lt=day_end))
+            tasks += [o for o in filterset.expand_occurrences(rules, (day_start, day_end)) if o.due_date < day_end]
+            tasks.sort(key=lambda t: t.due_date)
+            data["day"] = day.isoformat()
+            data["tasks"] = self.get_serializer(tasks, many=True).data
+        return Response(data)
+
+    def _agenda_date(self, name, default):
+        raw = self.request.query_params.get(name)
+        if not raw:
+            return default
+        try:
+            return DateField().to_internal_value(raw)
+        except ValidationError as exc:
+            raise ValidationError({name: exc.detail})
+
+    @action(detail=False, methods=["get"])
+    def tag_facets(self, request):
+        """Tag counts over the tasks matching the current filters."""
+        queryset = self.filter_queryset(self.get_queryset()).order_by().values("pk")
+        facets = (
+            TaggedTask.objects.using(queryset.db)
+            .filter(user=request.user, content_object_id__in=queryset)
+            .values("tag__name")
+            .annotate(count=Count("id"))
+            .order_by("-count", "tag__name")
+        )
+        return Response([{"name": f["tag__name"], "count": f["count"]} for f in facets])
+
+    @action(detail=False, methods=["get"], permission_classes=[IsAdminUser])
+    def cache_stats(self, request):
+        return Response(task_list_cache.stats())
+
+    @action(detail=True, methods=["post"])
+    def occurrence(self, request, pk=None):
+        task = self.get_occurrence(self.get_object())
+        serializer = self.get_serializer(task, data=request.data, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
     @action(detail=True, methods=["post"])
     def complete(self, request, pk=None):
         task = self.get_object()
-        task.status = "done"
+        if request.data.get("occurrence_date"):
+            task = self.get_occurrence(task)
+        task.status = STATUS_DONE
         task.completed_at = timezone.now()
         task.save(update_fields=["status", "completed_at"])
         serializer = self.get_serializer(task)
@@ -47,11 +266,12 @@ class NotificationViewSet(mixins.ListModelMixin, mixins.UpdateModelMixin, viewse
     filter_backends = [DjangoFilterBackend, OrderingFilter]
     filterset_class = NotificationFilter
     ordering_fields = ["created_at"]
+    throttle_scope = "notifications"
 
     def get_queryset(self):
-        return Notification.objects.filter(user=self.request.user)
+        return Notification.objects.for_user(self.request.user)
 
-    @action(detail=False, methods=["post"])
+    @action(detail=False, methods=["post"], throttle_scope="mark_all_read")
     def mark_all_read(self, request):
         qs = self.get_queryset().filter(is_read=False)
         updated = qs.update(is_read=True)
@@ -66,7 +286,7 @@ class TaskHistoryViewSet(mixins.ListModelMixin, mixins.RetrieveModelMixin, views
     ordering_fields = ["created_at"]
 
     def get_queryset(self):
-        return TaskHistory.objects.filter(user=self.request.user).select_related("task")
+        return TaskHistory.objects.for_user(self.request.user).select_related("task")
 
 # This accomodates home,login and signup
 from django.contrib.auth import login as auth_login, logout as auth_logout
@@ -74,7 +294,11 @@ from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib.auth.decorators import login_required
 from django.shortcuts import render, redirect, get_object_or_404
 from django.views.generic import TemplateView
+from django.conf import settings
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import FileResponse, Http404
 from .forms import LoginForm, SignupForm, TaskForm
+from .profiling import list_profiles, profile_path
 
 class HomeView(TemplateView):
     template_name = "landing.html"
@@ -112,8 +336,8 @@ def logout_view(request):
 class DashboardView(LoginRequiredMixin, TemplateView):
     template_name = "dashboard.html"
     def get(self, request, *args, **kwargs):
-        tasks = Task.objects.filter(user=request.user).order_by("-created_at")[:10]
-        notifications = Notification.objects.filter(user=request.user).order_by("-created_at")[:10]
+        tasks = Task.objects.for_user(request.user).order_by("-created_at")[:10]
+        notifications = Notification.objects.for_user(request.user).order_by("-created_at")[:10]
         return render(request, self.template_name, {"tasks": tasks, "notifications": notifications})
 
 @login_required
@@ -124,6 +348,7 @@ def create_task(request):
             t = form.save(commit=False)
             t.user = request.user
             t.save()
+            form.save_m2m()
             return redirect("dashboard")
     else:
         form = TaskForm()
@@ -131,7 +356,7 @@ def create_task(request):
 
 @login_required
 def edit_task(request, pk: int):
-    task = get_object_or_404(Task, pk=pk, user=request.user)
+    task = get_object_or_404(Task.objects.for_user(request.user), pk=pk)
     if request.method == "POST":
         form = TaskForm(request.POST, instance=task)
         if form.is_valid():
@@ -143,9 +368,24 @@ def edit_task(request, pk: int):
 
 @login_required
 def delete_task(request, pk: int):
-    task = get_object_or_404(Task, pk=pk, user=request.user)
+    task = get_object_or_404(Task.objects.for_user(request.user), pk=pk)
     if request.method == "POST":
-        task.delete()
+        task.soft_delete()
         return redirect("dashboard")
     return render(request, "confirm_delete.html", {"object": task})
 
+@staff_member_required
+def request_profiles(request):
+    return render(request, "admin/request_profiles.html", {
+        "title": "Request profiles",
+        "profiles": list_profiles(),
+        "enabled": settings.REQUEST_PROFILING,
+        "sample_rate": settings.REQUEST_PROFILING_SAMPLE_RATE,
+    })
+
+@staff_member_required
+def request_profile_download(request, profile_id: str, kind: str):
+    path = profile_path(profile_id, f".{kind}") if kind in ("prof", "json") else None
+    if path is None or not path.is_file():
+        raise Http404("No such profile.")
+    return FileResponse(path.open("rb"), as_attachment=True, filename=path.name)
@@ -36,18 +36,21 @@ INSTALLED_APPS = [
     "django.contrib.staticfiles",
     "rest_framework",
     "django_filters",
+    "taggit",
     "taskapp.apps.TaskappConfig",
 ]
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
+    "taskapp.middleware.APICompressionMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "taskapp.middleware.RequestProfilingMiddleware",
 ]
 
 ROOT_URLCONF = "taskmanagerproject.urls"
@@ -89,6 +92,29 @@ else:
         }
     }
 
+# Optional user-hash sharding of tasks, notifications and history (see
+# taskapp/sharding.py). SHARD_DATABASE_URLS takes a comma-separated list of
+# database URLs; SHARD_SQLITE_COUNT creates local SQLite shards for testing.
+TASK_SHARDS = []
+shard_urls = [*filter(None, os.getenv("SHARD_DATABASE_URLS", "").split(","))]
+for i, shard_url in enumerate(shard_urls):
+    DATABASES[f"shard_{i}"] = dj_database_url.parse(shard_url, conn_max_age=600)
+    if "mysql" in DATABASES[f"shard_{i}"]["ENGINE"]:
+        # Per-shard id residues (see taskapp.sharding.SHARD_ID_STRIDE).
+        DATABASES[f"shard_{i}"].setdefault("OPTIONS", {})["init_command"] = (
+            f"SET SESSION auto_increment_increment = 64, auto_increment_offset = {i + 1}"
+        )
+    TASK_SHARDS.append(f"shard_{i}")
+if not shard_urls:
+    for i in range(int(os.getenv("SHARD_SQLITE_COUNT", "0"))):
+        DATABASES[f"shard_{i}"] = {
+            "ENGINE": "django.db.backends.sqlite3",
+            "NAME": BASE_DIR / f"shard_{i}.sqlite3",
+        }
+        TASK_SHARDS.append(f"shard_{i}")
+if TASK_SHARDS:
+    DATABASE_ROUTERS = ["taskapp.sharding.UserShardRouter"]
+
 AUTH_USER_MODEL = "taskapp.User"
 
 REST_FRAMEWORK = {
@@ -104,16 +130,65 @@ REST_FRAMEWORK = {
         "rest_framework.filters.SearchFilter",
         "rest_framework.filters.OrderingFilter",
     ),
+    "DEFAULT_RENDERER_CLASSES": (
+        "taskapp.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
+    "DEFAULT_PARSER_CLASSES": (
+        "taskapp.parsers.FastJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ),
     "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
     "PAGE_SIZE": 20,
+    "DEFAULT_THROTTLE_CLASSES": (
+        "taskapp.throttling.UserTokenBucketThrottle",
+        "taskapp.throttling.ScopedTokenBucketThrottle",
+    ),
+    "DEFAULT_THROTTLE_RATES": {
+        "user": os.getenv("THROTTLE_USER_RATE", "600/min"),
+        "anon": os.getenv("THROTTLE_ANON_RATE", "120/min"),
+        "tasks": os.getenv("THROTTLE_TASKS_RATE", "300/min"),
+        "notifications": os.getenv("THROTTLE_NOTIFICATIONS_RATE", "120/min"),
+        "mark_all_read": os.getenv("THROTTLE_MARK_ALL_READ_RATE", "10/min"),
+        "register": os.getenv("THROTTLE_REGISTER_RATE", "5/hour"),
+        "login": os.getenv("THROTTLE_LOGIN_RATE", "10/min"),
+    },
+    "NUM_PROXIES": int(os.getenv("NUM_PROXIES", "0")),
 }
 
+# Per-process only. State every gunicorn worker must see (task-list versions,
+# throttle buckets) lives in the database: see taskapp.TaskListVersion and
+# taskapp.ThrottleBucket.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    },
+}
+
+TASK_LIST_CACHE_SIZE = int(os.getenv("TASK_LIST_CACHE_SIZE", "512"))
+TASK_LIST_CACHE_TTL = int(os.getenv("TASK_LIST_CACHE_TTL", "300"))
+TASK_LIST_CACHE_SHORT_TTL = int(os.getenv("TASK_LIST_CACHE_SHORT_TTL", "15"))
+
 SIMPLE_JWT = {
     "ACCESS_TOKEN_LIFETIME": timedelta(minutes=30),
     "REFRESH_TOKEN_LIFETIME": timedelta(days=7),
     "AUTH_HEADER_TYPES": ("Bearer",),
 }
 
+API_COMPRESSION_MIN_SIZE = int(os.getenv("API_COMPRESSION_MIN_SIZE", "1024"))
+# Below 6, brotli output is larger than gzip's on bench_api_render payloads.
+API_COMPRESSION_BROTLI_QUALITY = int(os.getenv("API_COMPRESSION_BROTLI_QUALITY", "6"))
+
+TASK_HISTORY_SNAPSHOT_EVERY = int(os.getenv("TASK_HISTORY_SNAPSHOT_EVERY", "20"))
+
+# Per-request profiling, listed at /admin/profiles/. Off means the middleware
+# is not installed; SAMPLE_RATE=N profiles one in N requests.
+REQUEST_PROFILING = os.getenv("REQUEST_PROFILING", "0") == "1"
+REQUEST_PROFILING_SAMPLE_RATE = int(os.getenv("REQUEST_PROFILING_SAMPLE_RATE", "0"))
+REQUEST_PROFILING_DIR = os.getenv("REQUEST_PROFILING_DIR", str(BASE_DIR / ".profiles"))
+REQUEST_PROFILING_KEEP = int(os.getenv("REQUEST_PROFILING_KEEP", "200"))
+
 LANGUAGE_CODE = "en-us"
 TIME_ZONE = "UTC"
 USE_I18N = True
@@ -0,0 +1,16 @@
+"""
+Settings for the test suite: the project settings plus two spare SQLite
+aliases that the sharding tests route to themselves (TASK_SHARDS stays
+empty, so every other test runs unsharded).
+
+    python manage.py test --settings=taskmanagerproject.test_settings
+"""
+
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, DATABASES
+
+# A new dict: test discovery imports this module under the normal settings too.
+DATABASES = {
+    **{f"shard_{i}": {"ENGINE": "django.db.backends.sqlite3", "NAME": BASE_DIR / f"shard_{i}.sqlite3"} for i in range(2)},
+    **DATABASES,
+}
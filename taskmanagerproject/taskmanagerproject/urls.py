@@ -17,13 +17,14 @@ Including another URLconf
 from django.contrib import admin
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
+from rest_framework_simplejwt.views import TokenRefreshView
 
 from taskapp.views import (
     TaskViewSet,
     NotificationViewSet,
     TaskHistoryViewSet,
     RegisterView,
+    LoginView,
     HomeView,
     DashboardView,
     login_view,
@@ -32,6 +33,8 @@ from taskapp.views import (
     create_task,   
     edit_task,     
     delete_task,   
+    request_profiles,
+    request_profile_download,
 )
 
 router = DefaultRouter()
@@ -53,11 +56,13 @@ urlpatterns = [
     path("tasks/<int:pk>/delete/", delete_task, name="task_delete"),
 
     
+    path("admin/profiles/", request_profiles, name="request_profiles"),
+    path("admin/profiles/<str:profile_id>.<str:kind>", request_profile_download, name="request_profile_download"),
     path("admin/", admin.site.urls),
 
     
     path("auth/register/", RegisterView.as_view(), name="register"),
-    path("auth/login/", TokenObtainPairView.as_view(), name="token_obtain_pair"),
+    path("auth/login/", LoginView.as_view(), name="token_obtain_pair"),
     path("auth/refresh/", TokenRefreshView.as_view(), name="token_refresh"),
 
 
@@ -0,0 +1,88 @@
+"""
+Pre-fork warm-up for the taskmanagerproject WSGI application.
+
+Run in the gunicorn master (see ``gunicorn.conf.py``) after the app has been
+preloaded, so everything built here is shared copy-on-write by the workers
+instead of being rebuilt by each of them on their first request.
+"""
+
+import time
+from pathlib import Path
+
+
+def _warm_models():
+    from django.apps import apps
+
+    for model in apps.get_models():
+        model._meta.get_fields()
+
+
+def _warm_urls():
+    from django.urls import get_resolver
+
+    resolver = get_resolver()
+    resolver.reverse_dict
+    resolver.namespace_dict
+    resolver.app_dict
+
+
+def _warm_router():
+    from taskmanagerproject.urls import router
+
+    for prefix, viewset, basename in router.registry:
+        viewset.get_extra_actions()
+    router.urls
+
+
+def _warm_serializers():
+    from rest_framework.settings import api_settings
+    from taskapp import serializers
+
+    for name in ("UserSerializer", "RegisterSerializer", "TaskSerializer",
+                 "NotificationSerializer", "TaskHistorySerializer"):
+        getattr(serializers, name)().fields
+    api_settings.DEFAULT_RENDERER_CLASSES
+    api_settings.DEFAULT_PARSER_CLASSES
+    api_settings.DEFAULT_AUTHENTICATION_CLASSES
+
+
+def _warm_filtersets():
+    from taskapp.filters import TaskFilter, NotificationFilter, TaskHistoryFilter
+
+    for filterset_class in (TaskFilter, NotificationFilter, TaskHistoryFilter):
+        model = filterset_class._meta.model
+        filterset_class(queryset=model.objects.none()).form
+
+
+def _warm_templates():
+    from django.template import engines
+
+    for engine in engines.all():
+        for template_dir in engine.dirs:
+            root = Path(template_dir)
+            for path in root.rglob("*.html"):
+                engine.get_template(path.relative_to(root).as_posix())
+
+
+STEPS = [
+    ("models", _warm_models),
+    ("urls", _warm_urls),
+    ("router", _warm_router),
+    ("serializers", _warm_serializers),
+    ("filtersets", _warm_filtersets),
+    ("templates", _warm_templates),
+]
+
+
+def warm_up():
+    """Run every warm-up step and return ``{step: milliseconds}``."""
+    from django.db import connections
+
+    timings = {}
+    for name, step in STEPS:
+        start = time.perf_counter()
+        step()
+        timings[name] = (time.perf_counter() - start) * 1000
+    # Never hand an open DB connection to forked workers.
+    connections.close_all()
+    return timings